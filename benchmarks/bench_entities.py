@@ -0,0 +1,240 @@
+"""Benchmark the memory and per-write cost of the Emonio sensor entities.
+
+Compares the sensors built from shared entity descriptions and ``_attr_``
+fields with the previous implementation, which copied every definition
+field into each entity and served it through its own ``@property``. Both
+the state write alone and a whole coordinator update, where most values
+stay within their deadband and only some are written, are timed. Needs
+Home Assistant installed (e.g. a development environment). Run it from the
+repository root:
+
+    python benchmarks/bench_entities.py --meters 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from homeassistant.components.sensor import SensorEntity  # noqa: E402
+from homeassistant.helpers.update_coordinator import CoordinatorEntity  # noqa: E402
+
+from custom_components.emonio.const import MAX_STATE_AGE  # noqa: E402
+from custom_components.emonio.registers import REGISTERS  # noqa: E402
+from custom_components.emonio.sensor import REGISTER_SENSORS, EmonioModbusSensor  # noqa: E402
+
+
+class LegacyEmonioModbusSensor(CoordinatorEntity, SensorEntity):
+    """The register sensor as it was before entity descriptions."""
+
+    def __init__(self, coordinator, register, mac_suffix, device_info):
+        super().__init__(coordinator)
+        quantity = register.quantity
+        self._name = f"Emonio {mac_suffix} {register.name}"
+        self._unit_of_measurement = quantity.unit
+        self._address = register.address
+        self._data_type = quantity.data_type
+        self._swap = quantity.swap
+        self._device_class = quantity.device_class
+        self._state_class = quantity.state_class
+        self._deadband = quantity.deadband
+        self._deadband_relative = quantity.deadband_relative
+        self._unique_id = f"{mac_suffix}_emonio_{register.key}"
+        self._device_info = device_info
+        self._state = 230.0
+        self._published_at = None
+        self._published_available = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def unit_of_measurement(self):
+        return self._unit_of_measurement
+
+    @property
+    def device_class(self):
+        return self._device_class
+
+    @property
+    def state_class(self):
+        return self._state_class
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        if self.coordinator.sampler is None:
+            return None
+        return self.coordinator.sampler.summary(self._address)
+
+    @property
+    def device_info(self):
+        return self._device_info
+
+    def _handle_coordinator_update(self):
+        value = self._current_value()
+        now = time.monotonic()
+        if self.available == self._published_available and not self._should_publish(value, now):
+            self.coordinator.suppressed_writes += 1
+            return
+        self._state = value
+        self._published_at = now
+        self._published_available = self.available
+        self.coordinator.published_writes += 1
+        self.async_write_ha_state()
+
+    def _should_publish(self, value, now):
+        if value is None or self._state is None:
+            return value != self._state
+        if now - self._published_at >= MAX_STATE_AGE:
+            return True
+        threshold = max(self._deadband, self._deadband_relative * abs(self._state))
+        if abs(value - self._state) > threshold:
+            return True
+        if self.coordinator.sampler is not None:
+            summary = self.coordinator.sampler.summary(self._address)
+            if summary is not None:
+                _, minimum, maximum, _ = summary
+                return maximum - self._state > threshold or self._state - minimum > threshold
+        return False
+
+    def _current_value(self):
+        if not self.coordinator.data:
+            return None
+        slot = self.coordinator.poller.index.get(self._address)
+        if slot is None:
+            return None
+        raw_value = self.coordinator.data[slot]
+        if raw_value is None:
+            return None
+        return round(raw_value, 2)
+
+
+def _coordinator():
+    return SimpleNamespace(
+        data=[230.0] * len(REGISTERS),
+        poller=SimpleNamespace(index={register.address: slot for slot, register in enumerate(REGISTERS)}),
+        sampler=None,
+        last_update_success=True,
+        suppressed_writes=0,
+        published_writes=0,
+    )
+
+
+def _prepare(entity):
+    """Put an entity in the state it has after being added, without a running HA."""
+    entity._published_at = time.monotonic()
+    entity._published_available = True
+    # Compute the state HA would write, without the state machine
+    entity.async_write_ha_state = entity._async_calculate_state
+
+
+def build_legacy(meters):
+    entities = []
+    for meter in range(meters):
+        suffix = f"{meter:06X}"
+        coordinator = _coordinator()
+        device_info = {"identifiers": {("emonio", suffix)}, "name": f"Emonio P3 {suffix}"}
+        for register in REGISTERS:
+            entities.append(LegacyEmonioModbusSensor(coordinator, register, suffix, device_info))
+    return entities
+
+
+def build_current(meters):
+    entities = []
+    for meter in range(meters):
+        suffix = f"{meter:06X}"
+        coordinator = _coordinator()
+        device_info = {"identifiers": {("emonio", suffix)}, "name": f"Emonio P3 {suffix}"}
+        for description in REGISTER_SENSORS:
+            entity = EmonioModbusSensor(coordinator, description, suffix, device_info)
+            entity._slot = coordinator.poller.index[description.address]
+            entity._published_value = 230.0
+            entities.append(entity)
+    return entities
+
+
+def measure_memory(build, meters):
+    tracemalloc.start()
+    entities = build(meters)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return entities, size
+
+
+def measure_writes(entities, rounds):
+    """Return the mean time HA spends computing the state and attributes of one write."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for entity in entities:
+            entity._async_calculate_state()
+    return (time.perf_counter() - started) / (rounds * len(entities))
+
+
+def measure_updates(entities, rounds, changed):
+    """Return the mean time of one entity handling a coordinator update.
+
+    In each round a ``changed`` share of the values leaves its deadband and
+    is written; the others keep their value and are suppressed.
+    """
+    coordinators = list({id(entity.coordinator): entity.coordinator for entity in entities}.values())
+    generator = random.Random(0)
+    elapsed = 0.0
+    for _ in range(rounds):
+        for coordinator in coordinators:
+            coordinator.data = [
+                345.0 if generator.random() < changed else 230.0 for _ in coordinator.data
+            ]
+        started = time.perf_counter()
+        for entity in entities:
+            entity._handle_coordinator_update()
+        elapsed += time.perf_counter() - started
+        # Back to the published value, so the next round sees the same share of changes
+        for entity in entities:
+            entity._state = entity._published_value = 230.0
+    return elapsed / (rounds * len(entities))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--meters", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20, help="simulated state writes per entity")
+    parser.add_argument(
+        "--changed", type=float, default=0.1, help="share of the values leaving their deadband per update"
+    )
+    args = parser.parse_args()
+
+    legacy, legacy_size = measure_memory(build_legacy, args.meters)
+    current, current_size = measure_memory(build_current, args.meters)
+    # Both must write exactly the same state
+    assert legacy[0]._async_calculate_state() == current[0]._async_calculate_state()
+    legacy_write = measure_writes(legacy, args.rounds)
+    current_write = measure_writes(current, args.rounds)
+    for entity in legacy + current:
+        _prepare(entity)
+    legacy_update = measure_updates(legacy, args.rounds, args.changed)
+    current_update = measure_updates(current, args.rounds, args.changed)
+
+    print(f"entities:            {len(current)} ({args.meters} meters)")
+    print(f"memory per entity:   legacy {legacy_size / len(legacy):.0f} B, current {current_size / len(current):.0f} B")
+    print(f"time per write:      legacy {legacy_write * 1e6:.2f} us, current {current_write * 1e6:.2f} us")
+    print(
+        f"time per update:     legacy {legacy_update * 1e6:.2f} us, current {current_update * 1e6:.2f} us"
+        f" ({args.changed:.0%} written)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark the Emonio polling path against simulated meters.
+
+Starts N simulated Emonio P3 meters, polls all of them through the
+integration's connection pool, client and poller for a while, and reports
+requests per second, cycle latency percentiles, CPU time and how long the
+event loop was blocked. Needs Home Assistant installed, since importing
+the integration runs its package ``__init__``. Run it from the repository
+root:
+
+    python benchmarks/bench_polling.py --meters 20 --duration 30
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.emonio.poller import EmonioPoller  # noqa: E402
+from custom_components.emonio.pool import EmonioConnectionPool  # noqa: E402
+from custom_components.emonio.registers import REGISTERS  # noqa: E402
+from custom_components.emonio.simulator import EmonioSimulator  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Return the value below which ``fraction`` of ``values`` fall."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoopMonitor:
+    """Measure how late the event loop wakes up a task that sleeps in short steps."""
+
+    def __init__(self, step=0.005):
+        self.step = step
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.step)
+            lag = time.perf_counter() - started - self.step
+            if lag > 0:
+                self.max_lag = max(self.max_lag, lag)
+                self.total_lag += lag
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+
+async def run(args):
+    simulators = []
+    for _ in range(args.meters):
+        simulator = EmonioSimulator(
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            drop_rate=args.drop_rate,
+            exception_rate=args.exception_rate,
+        )
+        port = await simulator.start(port=0)
+        simulators.append((simulator, port))
+
+    pool = EmonioConnectionPool(args.concurrency)
+    pollers = []
+    for _, port in simulators:
+        poller = EmonioPoller(pool.acquire("127.0.0.1", port))
+        for register in REGISTERS:
+            poller.register(register.address, register.quantity.group)
+        pollers.append(poller)
+    blocks_per_cycle = len(pollers[0].plan())
+
+    async def poll(poller):
+        started = time.perf_counter()
+        try:
+            await pool.async_poll(poller.async_refresh)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    monitor = LoopMonitor()
+    monitor.start()
+    cycle_times = []
+    device_times = []
+    failures = 0
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        cycle_started = time.perf_counter()
+        results = await asyncio.gather(*(poll(poller) for poller in pollers))
+        cycle_times.append(time.perf_counter() - cycle_started)
+        device_times.extend(result for result in results if result is not None)
+        failures += sum(result is None for result in results)
+        if args.interval:
+            await asyncio.sleep(max(0, args.interval - cycle_times[-1]))
+    elapsed = time.perf_counter() - started
+    cpu_time = time.process_time() - cpu_started
+    monitor.stop()
+
+    await pool.async_close()
+    for simulator, _ in simulators:
+        await simulator.stop()
+
+    requests = sum(simulator.requests for simulator, _ in simulators)
+    print(f"meters:              {args.meters}")
+    print(f"blocks per cycle:    {blocks_per_cycle} per meter")
+    print(f"cycles:              {len(cycle_times)} in {elapsed:.1f} s")
+    print(f"requests/s:          {requests / elapsed:.0f}")
+    print(f"failed device polls: {failures}")
+    print(f"cycle p50 / p99:     {percentile(cycle_times, 0.5) * 1000:.2f} / {percentile(cycle_times, 0.99) * 1000:.2f} ms")
+    print(f"device p50 / p99:    {percentile(device_times, 0.5) * 1000:.2f} / {percentile(device_times, 0.99) * 1000:.2f} ms")
+    print(f"CPU time:            {cpu_time:.2f} s ({cpu_time / elapsed:.0%}, includes the simulators)")
+    print(f"loop blocked:        max {monitor.max_lag * 1000:.2f} ms, total {monitor.total_lag * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--meters", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between cycles, 0 polls back to back")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent polls in the pool")
+    parser.add_argument("--latency", type=float, default=2.0, help="simulated response latency in ms")
+    parser.add_argument("--jitter", type=float, default=1.0, help="simulated extra latency in ms")
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--exception-rate", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
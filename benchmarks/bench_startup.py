@@ -0,0 +1,75 @@
+"""Report how long each module of the Emonio integration takes to import.
+
+Every module is imported in a fresh interpreter with ``-X importtime`` so
+modules already imported by another one do not hide their cost. Run it
+from the repository root in an environment with Home Assistant installed:
+
+    python benchmarks/bench_startup.py
+
+The time spent in ``async_setup_entry`` is measured by the integration
+itself; it is logged at debug level and shown in the config entry
+diagnostics.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "custom_components.emonio"
+MODULES = (
+    "",
+    ".config_flow",
+    ".sensor",
+    ".coordinator",
+    ".diagnostics",
+)
+
+
+def import_time(module, baseline="homeassistant.core"):
+    """Return (self, cumulative) microseconds spent importing ``module``.
+
+    ``baseline`` is imported first, since Home Assistant itself is always
+    loaded before the integration.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {baseline}; import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_self = 0
+    cumulative = 0
+    baseline_done = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # Header line
+        name = fields[2].strip()
+        if not baseline_done:
+            baseline_done = name == baseline
+            continue
+        total_self += int(fields[0])
+        if name == module:
+            cumulative = int(fields[1])
+    return total_self, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="imports per module, best is reported")
+    args = parser.parse_args()
+
+    print(f"{'module':<40} {'best ms':>10} {'cumulative ms':>14}")
+    for suffix in MODULES:
+        module = PACKAGE + suffix
+        runs = [import_time(module) for _ in range(args.runs)]
+        best = min(runs)
+        print(f"{module:<40} {best[0] / 1000:>10.1f} {best[1] / 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,219 @@
 import asyncio
 import logging
+import time
+from datetime import timedelta
 
+import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import ConfigEntryNotReady, HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
+from .const import (
+    CONF_DERIVED_METRICS,
+    CONF_MAC,
+    CONF_MAX_CONCURRENT_POLLS,
+    CONF_SAMPLING_INTERVAL,
+    CONF_SCAN_INTERVALS,
+    CONF_SITE_AGGREGATES,
+    CONF_SITE_SCAN_INTERVAL,
+    CONF_SNAPSHOT_TTL,
+    CONF_UNIT_IDS,
+    DATA_POOL,
+    DATA_PROFILER,
+    DATA_SITE,
+    DEFAULT_DERIVED_METRICS,
+    DEFAULT_MAX_CONCURRENT_POLLS,
+    DEFAULT_PROFILE_CYCLES,
+    DEFAULT_PROFILE_THRESHOLD,
+    DEFAULT_SAMPLING_INTERVAL,
+    DEFAULT_SITE_AGGREGATES,
+    DEFAULT_SNAPSHOT_TTL,
+    DEFAULT_UNIT_ID,
+    DOMAIN,
+    EVENT_SNAPSHOT,
+    GATEWAY_MAX_IN_FLIGHT,
+    SCAN_INTERVAL,
+    SERVICE_PROFILE,
+    SERVICE_READ_ALL,
+)
+from .coordinator import EmonioDataUpdateCoordinator
+from .counters import async_remove_counters, storage_key as counter_storage_key
+from .identity import async_get_mac_address, mac_suffix as get_mac_suffix
+from .modbus import EmonioModbusClient
+from .pool import EmonioConnectionPool
+from .profiler import EmonioProfiler
+from .site import EmonioSiteCoordinator, async_read_all, meters
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = vol.Schema({
+    vol.Optional(DOMAIN, default={}): vol.Schema({
+        vol.Optional(
+            CONF_MAX_CONCURRENT_POLLS, default=DEFAULT_MAX_CONCURRENT_POLLS
+        ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(CONF_SITE_AGGREGATES, default=DEFAULT_SITE_AGGREGATES): cv.boolean,
+        vol.Optional(
+            CONF_SITE_SCAN_INTERVAL, default=SCAN_INTERVAL.total_seconds()
+        ): vol.All(vol.Coerce(float), vol.Range(min=1)),
+    }),
+}, extra=vol.ALLOW_EXTRA)
+
+PROFILE_SCHEMA = vol.Schema({
+    vol.Optional("cycles", default=DEFAULT_PROFILE_CYCLES): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=1000)
+    ),
+    vol.Optional("threshold", default=DEFAULT_PROFILE_THRESHOLD): vol.All(
+        vol.Coerce(float), vol.Range(min=1)
+    ),
+})
+
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the Emonio component."""
+    conf = config.get(DOMAIN, {})
+    pool = EmonioConnectionPool(
+        conf.get(CONF_MAX_CONCURRENT_POLLS, DEFAULT_MAX_CONCURRENT_POLLS)
+    )
+    hass.data[DATA_POOL] = pool
+
+    async def close_pool(event):
+        await pool.async_close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, close_pool)
+
+    async def read_all(call: ServiceCall):
+        """Read every meter at once and return the aligned snapshot."""
+        snapshot = await async_read_all(hass)
+        hass.bus.async_fire(EVENT_SNAPSHOT, snapshot)
+        return snapshot
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_READ_ALL, read_all, supports_response=SupportsResponse.OPTIONAL
+    )
+
+    async def profile(call: ServiceCall):
+        """Profile the update path of every meter for a number of poll cycles."""
+        if DATA_PROFILER in hass.data and hass.data[DATA_PROFILER].running:
+            raise HomeAssistantError("Profiling is already running")
+        coordinators = meters(hass)
+        if not coordinators:
+            raise HomeAssistantError("No Emonio meters are set up")
+        cycles = call.data["cycles"]
+        profiler = EmonioProfiler(
+            hass,
+            coordinators,
+            cycles,
+            call.data["threshold"] / 1000,
+            hass.config.path(f"{DOMAIN}_profile_{dt_util.utcnow():%Y%m%d%H%M%S}.prof"),
+        )
+        profiler.start()
+        hass.data[DATA_PROFILER] = profiler
+        # Give slow meters twice their scan interval per cycle
+        longest = max(coordinator.update_interval for coordinator in coordinators.values())
+        hass.async_create_background_task(
+            profiler.async_run(2 * cycles * longest.total_seconds()), f"{DOMAIN} profiler"
+        )
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE, profile, schema=PROFILE_SCHEMA)
+
+    if conf.get(CONF_SITE_AGGREGATES, DEFAULT_SITE_AGGREGATES):
+        hass.data[DATA_SITE] = EmonioSiteCoordinator(
+            hass,
+            timedelta(seconds=conf.get(CONF_SITE_SCAN_INTERVAL, SCAN_INTERVAL.total_seconds())),
+        )
+        hass.async_create_task(async_load_platform(hass, Platform.SENSOR, DOMAIN, {}, config))
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Emonio from a config entry."""
+    started = time.perf_counter()
     hass.data.setdefault(DOMAIN, {})
+    if CONF_MAC not in entry.data:
+        # Entries created before the MAC was stored: resolve it once and keep it
+        mac_address = await async_get_mac_address(hass, entry.data["host"])
+        if not mac_address:
+            # Talking to the device puts it into the ARP cache
+            client = EmonioModbusClient(entry.data["host"], entry.data.get("port", 502))
+            try:
+                await client.connect()
+            except (OSError, asyncio.TimeoutError) as e:
+                raise ConfigEntryNotReady(f"Unable to connect to {entry.data['host']}: {e}") from e
+            finally:
+                await client.close()
+            mac_address = await async_get_mac_address(hass, entry.data["host"])
+        if not mac_address:
+            raise ConfigEntryNotReady(f"Could not get MAC address for {entry.data['host']}")
+        hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_MAC: mac_address})
+
+    pool = hass.data[DATA_POOL]
+    scan_intervals = {
+        group: entry.options[option]
+        for group, option in CONF_SCAN_INTERVALS.items()
+        if option in entry.options
+    }
+    # One coordinator per unit id, all on the endpoint's single connection
+    unit_ids = entry.data.get(CONF_UNIT_IDS, [DEFAULT_UNIT_ID])
+    coordinators = {
+        unit: EmonioDataUpdateCoordinator(
+            hass,
+            pool,
+            entry.data["host"],
+            entry.data.get("port", 502),
+            scan_intervals,
+            entry.options.get(CONF_SAMPLING_INTERVAL, DEFAULT_SAMPLING_INTERVAL),
+            entry.options.get(CONF_SNAPSHOT_TTL, DEFAULT_SNAPSHOT_TTL),
+            entry.options.get(CONF_DERIVED_METRICS, DEFAULT_DERIVED_METRICS),
+            unit,
+            GATEWAY_MAX_IN_FLIGHT if len(unit_ids) > 1 else None,
+            counter_storage_key(entry.entry_id, unit),
+        )
+        for unit in unit_ids
+    }
+    await asyncio.gather(*(coordinator.counters.async_load() for coordinator in coordinators.values()))
+    coordinator = coordinators[unit_ids[0]]
+    # One device per unit id; unit 1 keeps the plain MAC suffix, so entries
+    # of a single meter keep their unique IDs
+    mac_suffix = get_mac_suffix(entry.data[CONF_MAC])
     hass.data[DOMAIN][entry.entry_id] = {
-        "client": None,  # Placeholder for the Modbus client
+        "client": coordinator.client,
+        "coordinator": coordinator,
+        "coordinators": coordinators,
+        "suffixes": {
+            unit: mac_suffix if unit == DEFAULT_UNIT_ID else f"{mac_suffix}_{unit}"
+            for unit in unit_ids
+        },
         "entities": [],  # Placeholder for the entities
     }
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
+    setup_time = time.perf_counter() - started
+    hass.data[DOMAIN][entry.entry_id]["setup_time"] = setup_time
+    _LOGGER.debug(f"Set up {entry.title} in {setup_time * 1000:.1f} ms")
 
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
-    if entry.entry_id in hass.data[DOMAIN]:
-        # Close Modbus client connections for all entities
-        for entity in hass.data[DOMAIN][entry.entry_id]["entities"]:
-            entity.close_connection()
+    # Remove the entities first, so nothing polls the client once it is released
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
+    if unload_ok and entry.entry_id in hass.data[DOMAIN]:
+        # Close the Modbus client connection shared by all entities
+        for coordinator in hass.data[DOMAIN][entry.entry_id]["coordinators"].values():
+            await coordinator.async_close()
 
         # Remove the entry from hass.data
         hass.data[DOMAIN].pop(entry.entry_id)
+    return unload_ok
 
-    await hass.config_entries.async_unload_platforms(entry, ["sensor"])
-    return True
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Delete the stored energy counters of a removed entry."""
+    for unit in entry.data.get(CONF_UNIT_IDS, [DEFAULT_UNIT_ID]):
+        await async_remove_counters(hass, entry.entry_id, unit)
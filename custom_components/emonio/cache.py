@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from .modbus import ModbusError
+
+
+class EmonioBlockCache:
+    """Short-lived cache of register blocks with in-flight request coalescing.
+
+    A read is answered from any cached block of the same unit that covers
+    the requested registers and is younger than ``ttl``. If a covering
+    block is being read right now, the caller awaits that request instead
+    of sending its own.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._blocks = {}
+        self._in_flight = {}
+
+    @staticmethod
+    def _slice(data, block_start, start, count):
+        offset = (start - block_start) * 2
+        return memoryview(data)[offset:offset + count * 2]
+
+    def _covering(self, blocks, unit, start, count):
+        for (block_unit, block_start, block_count), value in blocks.items():
+            if block_unit == unit and block_start <= start and start + count <= block_start + block_count:
+                return block_start, value
+        return None
+
+    async def async_read(self, read, unit, start, count, max_age=None):
+        """Return ``count`` registers from ``start``, calling ``read()`` only when needed.
+
+        ``max_age`` lowers the TTL for callers that need fresher data.
+        """
+        now = time.monotonic()
+        ttl = self.ttl if max_age is None else min(self.ttl, max_age)
+        cached = self._covering(self._blocks, unit, start, count)
+        if cached is not None:
+            block_start, (read_at, data) = cached
+            if now - read_at < ttl:
+                self.hits += 1
+                return self._slice(data, block_start, start, count)
+
+        pending = self._covering(self._in_flight, unit, start, count)
+        if pending is not None:
+            block_start, future = pending
+            self.coalesced += 1
+            data = await asyncio.shield(future)
+            return self._slice(data, block_start, start, count)
+
+        self.misses += 1
+        key = (unit, start, count)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            data = await read()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                # Only this caller was cancelled, not the ones waiting for it
+                e = ModbusError("Coalesced request was cancelled")
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+        future.set_result(data)
+        self._blocks[key] = (time.monotonic(), data)
+        return data
+
+    def as_dict(self):
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+        }
@@ -1,10 +1,37 @@
+import asyncio
+import logging
 from homeassistant import config_entries
 import voluptuous as vol
 import ipaddress
-from pymodbus.client.sync import ModbusTcpClient
-from scapy.all import ARP, Ether, srp
 
-from .const import DOMAIN
+from homeassistant.core import callback
+
+from .const import (
+    CONF_DERIVED_METRICS,
+    CONF_EXPORT_MAX_SIZE,
+    CONF_EXPORT_PATH,
+    CONF_IMPORT_STATISTICS,
+    CONF_MAC,
+    CONF_PUSH_TOPIC,
+    CONF_SAMPLING_INTERVAL,
+    CONF_SCAN_INTERVALS,
+    CONF_SNAPSHOT_TTL,
+    CONF_UNIT_IDS,
+    DEFAULT_DERIVED_METRICS,
+    DEFAULT_EXPORT_MAX_SIZE,
+    DEFAULT_EXPORT_PATH,
+    DEFAULT_IMPORT_STATISTICS,
+    DEFAULT_PUSH_TOPIC,
+    DEFAULT_SAMPLING_INTERVAL,
+    DEFAULT_SNAPSHOT_TTL,
+    DEFAULT_UNIT_ID,
+    DOMAIN,
+    SCAN_INTERVAL,
+)
+from .identity import async_get_mac_address, mac_suffix
+from .modbus import EmonioModbusClient, ModbusError
+
+_LOGGER = logging.getLogger(__name__)
 
 def validate_ip(value):
     """Validate if the value is a valid IP address."""
@@ -14,27 +41,27 @@ def validate_ip(value):
     except ValueError:
         raise vol.Invalid("Invalid IP address")
 
-def get_mac_address(ip_address):
-    """Get the MAC address of a device by IP address."""
+def parse_unit_ids(value):
+    """Parse a comma separated list of Modbus unit ids."""
     try:
-        arp_request = ARP(pdst=ip_address)
-        broadcast = Ether(dst="ff:ff:ff:ff:ff:ff")
-        arp_request_broadcast = broadcast / arp_request
-        answered_list = srp(arp_request_broadcast, timeout=1, verbose=False)[0]
-
-        for sent, received in answered_list:
-            return received.hwsrc
-
-        return None
-    except Exception as e:
-        _LOGGER.error(f"Error getting MAC address for {ip_address}: {e}")
-        return None
+        unit_ids = sorted({int(unit) for unit in str(value).replace(" ", "").split(",") if unit})
+    except ValueError:
+        raise vol.Invalid("Invalid unit id")
+    if not unit_ids or not all(1 <= unit <= 255 for unit in unit_ids):
+        raise vol.Invalid("Unit ids must be between 1 and 255")
+    return unit_ids
 
 class EmonioModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Emonio Modbus."""
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Return the options flow handler."""
+        return EmonioOptionsFlowHandler(config_entry)
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         errors = {}
@@ -43,15 +70,21 @@ class EmonioModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             # Validate the IP address here
             try:
                 validate_ip(user_input['host'])
-                return await self.async_step_test_connection(user_input)
             except vol.Invalid:
                 errors["host"] = "Invalid IP address. Check your Emonio IP."
+            try:
+                unit_ids = parse_unit_ids(user_input.get(CONF_UNIT_IDS, DEFAULT_UNIT_ID))
+            except vol.Invalid:
+                errors[CONF_UNIT_IDS] = "Invalid unit ids. Use e.g. 1 or 1, 2, 3."
+            if not errors:
+                return await self.async_step_test_connection({**user_input, CONF_UNIT_IDS: unit_ids})
 
         # Define the data schema with a legend and IP validation
         data_schema = vol.Schema(
             {
                 vol.Required("host", description="Emonio IP"): str,
                 vol.Required("port", default=502, description="Modbus Port"): int,
+                vol.Optional(CONF_UNIT_IDS, default=str(DEFAULT_UNIT_ID)): str,
             }
         )
 
@@ -66,22 +99,40 @@ class EmonioModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
         host = user_input['host']
         port = user_input['port']
+        unit_ids = user_input[CONF_UNIT_IDS]
+        missing_units = []
 
-        def connect_client():
-            client = ModbusTcpClient(host, port)
-            connection_result = client.connect()
-            client.close()
-            return connection_result
-
-        def fetch_mac_address():
-            return get_mac_address(host)
-
-        connection_result = await self.hass.async_add_executor_job(connect_client)
-        if connection_result:
-            mac_address = await self.hass.async_add_executor_job(fetch_mac_address)
+        async def connect_client():
+            client = EmonioModbusClient(host, port)
+            try:
+                await client.connect()
+                if len(unit_ids) > 1 or unit_ids[0] != DEFAULT_UNIT_ID:
+                    # Behind a gateway, check that every unit answers
+                    for unit in unit_ids:
+                        try:
+                            await client.read_holding_registers(0, 2, unit=unit)
+                        except (ModbusError, asyncio.TimeoutError):
+                            missing_units.append(unit)
+                return True
+            except (OSError, asyncio.TimeoutError):
+                return False
+            finally:
+                await client.close()
+
+        connection_result = await connect_client()
+        if connection_result and missing_units:
+            errors["base"] = f"No answer from unit {', '.join(map(str, missing_units))}. Check the unit ids."
+        elif connection_result:
+            # The TCP connection above leaves the device in the ARP cache
+            mac_address = await async_get_mac_address(self.hass, host)
             if mac_address:
-                mac_suffix = mac_address.replace(':', '')[-6:].upper()
-                return self.async_create_entry(title=f"Emonio P3 {mac_suffix}", data=user_input)
+                suffix = mac_suffix(mac_address)
+                await self.async_set_unique_id(suffix)
+                self._abort_if_unique_id_configured(updates={"host": host, "port": port})
+                return self.async_create_entry(
+                    title=f"Emonio P3 {suffix}",
+                    data={**user_input, CONF_MAC: mac_address},
+                )
             else:
                 errors["base"] = "Could not get MAC address. Ensure the device is reachable."
         else:
@@ -93,7 +144,66 @@ class EmonioModbusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 {
                     vol.Required("host", description="Emonio IP"): str,
                     vol.Required("port", default=502, description="Modbus Port"): int,
+                    vol.Optional(CONF_UNIT_IDS, default=str(DEFAULT_UNIT_ID)): str,
                 }
             ),
             errors=errors,
         )
+
+
+class EmonioOptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Emonio options."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the polling options."""
+        errors = {}
+        if user_input is not None:
+            # 0 turns sampling off, anything else must be at least 100 ms
+            if 0 < user_input[CONF_SAMPLING_INTERVAL] < 100:
+                errors[CONF_SAMPLING_INTERVAL] = "invalid_interval"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = {**self._config_entry.options, **(user_input or {})}
+        default_interval = int(SCAN_INTERVAL.total_seconds())
+        schema = {
+            vol.Required(
+                option, default=options.get(option, default_interval)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600))
+            for option in CONF_SCAN_INTERVALS.values()
+        }
+        schema[vol.Required(
+            CONF_SAMPLING_INTERVAL,
+            default=options.get(CONF_SAMPLING_INTERVAL, DEFAULT_SAMPLING_INTERVAL),
+        )] = vol.All(vol.Coerce(int), vol.Range(min=0, max=60000))
+        schema[vol.Required(
+            CONF_SNAPSHOT_TTL,
+            default=options.get(CONF_SNAPSHOT_TTL, DEFAULT_SNAPSHOT_TTL),
+        )] = vol.All(vol.Coerce(float), vol.Range(min=0, max=60))
+        schema[vol.Optional(
+            CONF_EXPORT_PATH,
+            default=options.get(CONF_EXPORT_PATH, DEFAULT_EXPORT_PATH),
+        )] = str
+        schema[vol.Required(
+            CONF_EXPORT_MAX_SIZE,
+            default=options.get(CONF_EXPORT_MAX_SIZE, DEFAULT_EXPORT_MAX_SIZE),
+        )] = vol.All(vol.Coerce(int), vol.Range(min=1))
+        schema[vol.Required(
+            CONF_IMPORT_STATISTICS,
+            default=options.get(CONF_IMPORT_STATISTICS, DEFAULT_IMPORT_STATISTICS),
+        )] = bool
+        schema[vol.Required(
+            CONF_DERIVED_METRICS,
+            default=options.get(CONF_DERIVED_METRICS, DEFAULT_DERIVED_METRICS),
+        )] = bool
+        schema[vol.Optional(
+            CONF_PUSH_TOPIC,
+            default=options.get(CONF_PUSH_TOPIC, DEFAULT_PUSH_TOPIC),
+        )] = str
+        data_schema = vol.Schema(schema)
+
+        return self.async_show_form(step_id="init", data_schema=data_schema, errors=errors)
@@ -1 +1,125 @@
+from datetime import timedelta
+
 DOMAIN = "emonio"
+
+# MAC address of the device, resolved once by the config flow
+CONF_MAC = "mac"
+
+# Seconds a parsed /proc/net/arp is reused for runtime MAC lookups
+ARP_CACHE_TTL = 60
+
+# hass.data key of the connection pool shared by all config entries
+DATA_POOL = f"{DOMAIN}_pool"
+
+# Modbus unit ids polled over the entry's connection, e.g. behind a gateway
+CONF_UNIT_IDS = "unit_ids"
+DEFAULT_UNIT_ID = 1
+# Requests in flight at once on a connection shared by several units;
+# serial gateways answer one request at a time anyway
+GATEWAY_MAX_IN_FLIGHT = 1
+
+CONF_MAX_CONCURRENT_POLLS = "max_concurrent_polls"
+DEFAULT_MAX_CONCURRENT_POLLS = 8
+
+# Site totals over all meters, read together in one synchronized cycle
+CONF_SITE_AGGREGATES = "site_aggregates"
+CONF_SITE_SCAN_INTERVAL = "site_scan_interval"
+DEFAULT_SITE_AGGREGATES = False
+# hass.data key of the site coordinator
+DATA_SITE = f"{DOMAIN}_site"
+SERVICE_READ_ALL = "read_all"
+# Event fired with the snapshot of every read_all service call
+EVENT_SNAPSHOT = f"{DOMAIN}_snapshot"
+
+# Opt-in profiling of the update path
+SERVICE_PROFILE = "profile"
+# hass.data key of the current or last profiling session
+DATA_PROFILER = f"{DOMAIN}_profiler"
+DEFAULT_PROFILE_CYCLES = 10
+# Milliseconds a call may hold the event loop before it is flagged
+DEFAULT_PROFILE_THRESHOLD = 50
+# Slow steps and loop stalls kept per session
+PROFILE_MAX_EVENTS = 100
+# Innermost frames kept of the stack the loop was stuck in
+PROFILE_STACK_DEPTH = 15
+# Functions listed in the diagnostics, by cumulative time
+PROFILE_TOP_FUNCTIONS = 40
+
+SCAN_INTERVAL = timedelta(seconds=5)
+
+# Registers are polled in groups, each with its own scan interval
+POLL_GROUP_POWER = "power"
+POLL_GROUP_ELECTRICAL = "electrical"
+POLL_GROUP_ENERGY = "energy"
+POLL_GROUPS = (POLL_GROUP_POWER, POLL_GROUP_ELECTRICAL, POLL_GROUP_ENERGY)
+
+CONF_SCAN_INTERVAL_POWER = "scan_interval_power"
+CONF_SCAN_INTERVAL_ELECTRICAL = "scan_interval_electrical"
+CONF_SCAN_INTERVAL_ENERGY = "scan_interval_energy"
+CONF_SCAN_INTERVALS = {
+    POLL_GROUP_POWER: CONF_SCAN_INTERVAL_POWER,
+    POLL_GROUP_ELECTRICAL: CONF_SCAN_INTERVAL_ELECTRICAL,
+    POLL_GROUP_ENERGY: CONF_SCAN_INTERVAL_ENERGY,
+}
+
+# Seconds a register block read is reused for other reads of the same registers
+CONF_SNAPSHOT_TTL = "snapshot_ttl"
+DEFAULT_SNAPSHOT_TTL = 0.5
+
+# Export of every snapshot to CSV files; an empty path disables it
+CONF_EXPORT_PATH = "export_path"
+CONF_EXPORT_MAX_SIZE = "export_max_size"
+DEFAULT_EXPORT_PATH = ""
+DEFAULT_EXPORT_MAX_SIZE = 1024  # MB per device
+EXPORT_BATCH_SIZE = 600
+EXPORT_FLUSH_INTERVAL = 60
+
+# Import hourly energy statistics in bulk
+CONF_IMPORT_STATISTICS = "import_statistics"
+DEFAULT_IMPORT_STATISTICS = False
+
+# Derived metrics (imbalance, power shares, ...) computed from each snapshot
+CONF_DERIVED_METRICS = "derived_metrics"
+DEFAULT_DERIVED_METRICS = False
+
+# MQTT topic the device pushes readings to, "{unit}" is replaced by the
+# unit id; an empty topic polls only
+CONF_PUSH_TOPIC = "push_topic"
+DEFAULT_PUSH_TOPIC = ""
+# Seconds without a pushed value after which its register is polled again
+PUSH_TIMEOUT = 15
+# Seconds pushed values are collected before the entities are updated once
+PUSH_DEBOUNCE = 0.5
+
+# High-rate sampling of power and current in milliseconds, 0 disables it
+CONF_SAMPLING_INTERVAL = "sampling_interval"
+DEFAULT_SAMPLING_INTERVAL = 0
+
+# Energy counter validation: a reading may grow by at most the highest
+# power on its phase since the last good reading times the margin, plus
+# the minimum power in W. Other readings are published once this many
+# consecutive readings agree on them.
+COUNTER_POWER_MARGIN = 1.5
+COUNTER_MIN_POWER = 1000
+# Assumed power in W while the actual power is unknown, e.g. after a restart
+COUNTER_FALLBACK_POWER = 100_000
+COUNTER_CONFIRMATIONS = 3
+# Seconds the last good counters are kept in memory before they are stored
+COUNTER_SAVE_DELAY = 60
+
+# Seconds after which a state is written again even if it stayed within its deadband
+MAX_STATE_AGE = 300
+
+# Seconds to wait for a connection or a single Modbus response
+DEFAULT_TIMEOUT = 3
+
+# Exponential reconnect backoff in seconds, randomized by up to half
+RECONNECT_BACKOFF_MIN = 1
+RECONNECT_BACKOFF_MAX = 300
+# Consecutive request timeouts after which a connection is considered dead
+CIRCUIT_TIMEOUT_THRESHOLD = 3
+
+# Modbus function code 3 can return at most 125 registers per request.
+MAX_BLOCK_REGISTERS = 125
+# Unused registers we are willing to read to save a separate request.
+MAX_BLOCK_GAP = 8
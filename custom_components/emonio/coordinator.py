@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import DEFAULT_SNAPSHOT_TTL, DEFAULT_UNIT_ID, DOMAIN, POLL_GROUPS, SCAN_INTERVAL
+from .cache import EmonioBlockCache
+from .counters import EmonioCounterFilter
+from .derived import EmonioDerivedMetrics
+from .metrics import EmonioPollMetrics
+from .poller import EmonioPoller
+from .sampling import EmonioSampler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EmonioDataUpdateCoordinator(DataUpdateCoordinator):
+    """Poll one Emonio device and fan the snapshot out to its entities.
+
+    Devices behind a gateway each have their own coordinator, identified by
+    ``unit``, all sharing the endpoint's pooled connection.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        pool,
+        host,
+        port,
+        scan_intervals=None,
+        sampling_interval=0,
+        snapshot_ttl=DEFAULT_SNAPSHOT_TTL,
+        derived_metrics=False,
+        unit=DEFAULT_UNIT_ID,
+        max_in_flight=None,
+        storage_key=None,
+    ):
+        # Tick at the shortest group interval and read only the groups that are due
+        self.scan_intervals = {
+            group: SCAN_INTERVAL.total_seconds() for group in POLL_GROUPS
+        }
+        self.scan_intervals.update(scan_intervals or {})
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {host}" if unit == DEFAULT_UNIT_ID else f"{DOMAIN} {host} unit {unit}",
+            update_interval=timedelta(seconds=min(self.scan_intervals.values())),
+        )
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.client = pool.acquire(host, port, max_in_flight)
+        self.metrics = EmonioPollMetrics(self.client)
+        # Never serve a scheduled poll from the cache, so stay below half a tick
+        self.cache = EmonioBlockCache(
+            min(snapshot_ttl, self.update_interval.total_seconds() / 2)
+        )
+        self.poller = EmonioPoller(
+            self.client, swap="word", unit=unit, metrics=self.metrics, cache=self.cache
+        )
+        self._pool = pool
+        self._stagger = 0
+        self._next_poll = {}
+        self.sampler = None
+        if sampling_interval:
+            # One window of samples per publish, i.e. per coordinator tick
+            interval = sampling_interval / 1000
+            capacity = max(1, math.ceil(self.update_interval.total_seconds() / interval))
+            self.sampler = EmonioSampler(
+                EmonioPoller(
+                    self.client, swap="word", unit=unit, metrics=self.metrics, cache=self.cache,
+                    max_age=interval / 2,
+                ),
+                interval,
+                capacity,
+            )
+        # Energy counters are validated before anything sees them
+        self.counters = EmonioCounterFilter(
+            hass, self.poller, storage_key or f"{DOMAIN}.counters.{host}.{port}.{unit}"
+        )
+        self.derived = None
+        # Receiver of pushed readings, set when the device streams them
+        self.stream = None
+        if derived_metrics:
+            self.derived = EmonioDerivedMetrics(self.poller)
+        # State writes done and skipped by the entities' deadbands
+        self.published_writes = 0
+        self.suppressed_writes = 0
+        # Step timer of a running profiling session
+        self.timer = None
+        # Consumers stopped before the connection is released
+        self._on_close = []
+        self._closed = False
+
+    def async_on_close(self, func):
+        """Call ``func`` (a callback or coroutine function) when the device is closed."""
+        self._on_close.append(func)
+
+    def async_create_background_task(self, config_entry, target, name):
+        """Run ``target`` in the background until the device is closed."""
+        task = config_entry.async_create_background_task(self.hass, target, name)
+
+        async def cancel():
+            task.cancel()
+            await asyncio.wait([task])
+
+        self.async_on_close(cancel)
+        return task
+
+    def set_timer(self, timer):
+        """Time the update steps with ``timer``, or stop timing them with ``None``."""
+        self.timer = timer
+        self.poller.timer = timer
+
+    def stagger(self, delay):
+        """Delay the next refresh once, shifting this device's polling phase."""
+        self._stagger = delay
+
+    def _unreachable(self):
+        """Return why the device is not polled right now, ``None`` if it is."""
+        if self.client.circuit_open:
+            return f"{self.host} is unreachable, retrying in {self.client.retry_in:.0f} s"
+        retry_in = self.client.unit_retry_in(self.unit)
+        if retry_in:
+            # Backed off behind a gateway that still answers for other units
+            return f"Unit {self.unit} at {self.host} is not answering, retrying in {retry_in:.0f} s"
+        return None
+
+    def _due_groups(self):
+        """Return the poll groups due in this cycle and schedule their next poll."""
+        now = time.monotonic()
+        # Allow half a tick of slack so scheduler jitter does not skip a cycle
+        slack = self.update_interval.total_seconds() / 2
+        due = set()
+        for group in self.poller.groups:
+            if self.stream is not None and self.stream.covers(group, now):
+                continue  # The device pushes this group, no need to poll it
+            # After a failed cycle every group is read as soon as the device is back
+            if not self.last_update_success or self._next_poll.get(group, 0) <= now + slack:
+                due.add(group)
+                self._next_poll[group] = now + self.scan_intervals[group]
+        return due
+
+    async def _async_update_data(self):
+        """Read the register blocks of every due poll group in a single fetch."""
+        if self._stagger:
+            delay, self._stagger = self._stagger, 0
+            await asyncio.sleep(delay)
+        if self._closed:
+            return self.poller.values  # Closed while waiting, the entities are gone
+        if self.sampler is not None:
+            self.sampler.summarize()
+        unreachable = self._unreachable()
+        if unreachable:
+            if self.stream is not None and all(
+                self.stream.covers(group) for group in self.poller.groups
+            ):
+                return self.poller.values
+            # Entities become unavailable instead of showing stale values
+            raise UpdateFailed(unreachable)
+        due = self._due_groups()
+        if not due:
+            return self.poller.values
+        return await self._async_read(due)
+
+    async def _async_read(self, groups):
+        """Read ``groups`` through the pool and process the new snapshot."""
+        started = time.monotonic()
+        try:
+            data = await self._pool.async_poll(lambda: self.poller.async_refresh(groups))
+        except Exception as e:
+            self.metrics.record_cycle(time.monotonic() - started, False)
+            if self.timer is not None:
+                self.timer.add("poll", time.monotonic() - started)
+                self.timer.cycle()
+            raise UpdateFailed(f"Error communicating with Emonio: {e}") from e
+        self.metrics.record_cycle(time.monotonic() - started, True)
+        self.process_snapshot(data, groups)
+        if self.timer is not None:
+            self.timer.add("poll", time.monotonic() - started)
+            self.timer.cycle()
+        return data
+
+    async def async_read_now(self, due_only=False):
+        """Read the device right away and publish the snapshot to its entities.
+
+        Reads every poll group, or only the due ones with ``due_only``. The
+        regular poll timer restarts from here, so devices read together
+        stay in step. Returns ``None`` if the device could not be read.
+        """
+        if self.sampler is not None:
+            self.sampler.summarize()
+        if due_only:
+            groups = self._due_groups()
+        else:
+            groups = self.poller.groups
+            now = time.monotonic()
+            for group in groups:
+                self._next_poll[group] = now + self.scan_intervals[group]
+        try:
+            unreachable = self._unreachable()
+            if unreachable:
+                raise UpdateFailed(unreachable)
+            data = await self._async_read(groups) if groups else self.poller.values
+        except UpdateFailed as e:
+            self.async_set_update_error(e)
+            return None
+        self.async_set_updated_data(data)
+        return data
+
+    def process_snapshot(self, data, groups):
+        """Validate the counters and update the derived metrics of a new snapshot."""
+        started = time.perf_counter()
+        self.counters.process(data, groups)
+        if self.derived is not None:
+            self.derived.update(data, groups)
+        if self.timer is not None:
+            self.timer.add("process", time.perf_counter() - started, blocking=True)
+
+    @callback
+    def async_update_listeners(self):
+        """Update all entities, timing the fan-out while profiling."""
+        if self.timer is None:
+            super().async_update_listeners()
+            return
+        started = time.perf_counter()
+        super().async_update_listeners()
+        self.timer.add("publish", time.perf_counter() - started, blocking=True)
+
+    async def async_close(self):
+        """Stop the consumers, store the counters and release the pooled Modbus client connection."""
+        # Nothing may read through the client once it is released
+        self._closed = True
+        await self.async_shutdown()
+        while self._on_close:
+            result = self._on_close.pop()()
+            if asyncio.iscoroutine(result):
+                await result
+        await self.counters.async_save()
+        await self._pool.async_release(self.host, self.port)
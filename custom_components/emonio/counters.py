@@ -0,0 +1,167 @@
+import logging
+import math
+import time
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    COUNTER_CONFIRMATIONS,
+    COUNTER_FALLBACK_POWER,
+    COUNTER_MIN_POWER,
+    COUNTER_POWER_MARGIN,
+    COUNTER_SAVE_DELAY,
+    DOMAIN,
+    POLL_GROUP_ENERGY,
+)
+from .registers import PHASES, REGISTERS_BY_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# Watts times seconds to kWh
+_WATT_SECONDS_TO_KWH = 1 / 3_600_000
+
+
+def storage_key(entry_id, unit):
+    """Return the storage key of the counters of one unit of a config entry."""
+    return f"{DOMAIN}.counters.{entry_id}.{unit}"
+
+
+async def async_remove_counters(hass: HomeAssistant, entry_id, unit):
+    """Delete the stored counters of a removed device."""
+    await Store(hass, STORAGE_VERSION, storage_key(entry_id, unit)).async_remove()
+
+
+def float32_resolution(value):
+    """Return the spacing of float32 values around ``value``."""
+    return 2.0 ** (math.frexp(value)[1] - 24)
+
+
+class EmonioCounterFilter:
+    """Keep the energy counters of one device monotonic and plausible.
+
+    A new counter reading is accepted if it grew by no more than the
+    highest power seen on its phase since the last accepted reading could
+    have added, with some margin. Decreases within float32 resolution are
+    held at the last value. Anything else is replaced by the last good
+    value until ``COUNTER_CONFIRMATIONS`` consecutive readings agree on it;
+    a confirmed lower value is a counter reset, which the sensors report
+    with ``TOTAL_INCREASING`` semantics. The last good readings are stored
+    so the checks continue across restarts.
+    """
+
+    def __init__(self, hass: HomeAssistant, poller, storage_key):
+        self.poller = poller
+        self._store = Store(hass, STORAGE_VERSION, storage_key)
+        # address -> (value, wall clock time) of the last accepted reading
+        self._last = {}
+        # address -> (value, wall clock time, readings) of an unconfirmed jump
+        self._pending = {}
+        # address -> highest power in W on the counter's phase since it was accepted
+        self._peak_power = {}
+        self._power_addresses = {
+            REGISTERS_BY_KEY[f"{phase.key}_energy"].address: REGISTERS_BY_KEY[f"{phase.key}_power"].address
+            for phase in PHASES
+        }
+        self._power = {}
+        self._changed = False
+        self.rejected = 0
+        self.resets = 0
+
+    async def async_load(self):
+        """Restore the last good readings from before the restart."""
+        data = await self._store.async_load()
+        if data:
+            self._last = {int(address): tuple(last) for address, last in data["counters"].items()}
+
+    async def async_save(self):
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self):
+        return {"counters": {str(address): list(last) for address, last in self._last.items()}}
+
+    def process(self, values, groups=None):
+        """Validate the counters in the snapshot ``values`` in place."""
+        index = self.poller.index
+        self._power = {}
+        for energy_address, power_address in self._power_addresses.items():
+            slot = index.get(power_address)
+            if slot is None or values[slot] is None:
+                continue
+            power = self._power[energy_address] = abs(values[slot])
+            if energy_address in self._peak_power:
+                self._peak_power[energy_address] = max(self._peak_power[energy_address], power)
+
+        if groups is not None and POLL_GROUP_ENERGY not in groups:
+            return
+        now = time.time()
+        self._changed = False
+        for energy_address in self._power_addresses:
+            slot = index.get(energy_address)
+            if slot is not None and values[slot] is not None:
+                values[slot] = self._validate(energy_address, values[slot], now)
+        if self._changed:
+            self._store.async_delay_save(self._data_to_save, COUNTER_SAVE_DELAY)
+
+    def _validate(self, address, value, now):
+        """Return the value to publish for a counter reading."""
+        if not math.isfinite(value) or value < 0:
+            self.rejected += 1
+            return self._last[address][0] if address in self._last else None
+        if address not in self._last:
+            return self._accept(address, value, now)
+
+        last_value, last_time = self._last[address]
+        tolerance = 2 * float32_resolution(max(value, last_value))
+        delta = value - last_value
+        if -tolerance <= delta < 0:
+            return last_value  # Rounding of the float32 register
+        peak_power = self._peak_power.get(address, COUNTER_FALLBACK_POWER)
+        bound = (
+            (peak_power * COUNTER_POWER_MARGIN + COUNTER_MIN_POWER)
+            * max(0.0, now - last_time) * _WATT_SECONDS_TO_KWH
+            + tolerance
+        )
+        if 0 <= delta <= bound:
+            return self._accept(address, value, now)
+        return self._confirm(address, value, now, last_value)
+
+    def _confirm(self, address, value, now, last_value):
+        """Publish an implausible reading only once later readings agree with it."""
+        pending = self._pending.get(address)
+        readings = 1
+        if pending is not None:
+            pending_value, pending_time, pending_readings = pending
+            bound = (
+                COUNTER_FALLBACK_POWER * max(0.0, now - pending_time) * _WATT_SECONDS_TO_KWH
+                + 2 * float32_resolution(max(value, pending_value))
+            )
+            if pending_value <= value <= pending_value + bound:
+                readings = pending_readings + 1
+        if readings < COUNTER_CONFIRMATIONS:
+            self._pending[address] = (value, now, readings)
+            self.rejected += 1
+            return last_value
+        if value < last_value:
+            self.resets += 1
+            _LOGGER.info(f"Energy counter {address} was reset from {last_value} to {value} kWh")
+        else:
+            _LOGGER.warning(f"Energy counter {address} jumped from {last_value} to {value} kWh")
+        return self._accept(address, value, now)
+
+    def _accept(self, address, value, now):
+        self._last[address] = (value, now)
+        self._pending.pop(address, None)
+        # Bound the next reading by the power seen from now on
+        self._peak_power[address] = self._power.get(address, COUNTER_FALLBACK_POWER)
+        self._changed = True
+        return value
+
+    def as_dict(self):
+        return {
+            "rejected": self.rejected,
+            "resets": self.resets,
+            "counters": {address: last[0] for address, last in self._last.items()},
+        }
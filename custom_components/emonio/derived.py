@@ -0,0 +1,149 @@
+import logging
+import time
+from operator import itemgetter
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import PERCENTAGE, UnitOfPower
+
+from .const import POLL_GROUP_ENERGY
+from .registers import PHASES, REGISTERS_BY_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+# The three line phases, without the total block
+LINE_PHASES = tuple(phase for phase in PHASES if phase.key != "total")
+
+# Quantities the derived metrics are computed from
+INPUT_QUANTITIES = ("voltage", "current", "power", "apparent_power_reactive", "energy")
+
+# Derived metrics exposed as sensors
+DERIVED_SENSORS = (
+    SensorEntityDescription(
+        key="voltage_imbalance", name="Voltage Imbalance",
+        native_unit_of_measurement=PERCENTAGE, state_class=SensorStateClass.MEASUREMENT,
+    ),
+    SensorEntityDescription(
+        key="current_imbalance", name="Current Imbalance",
+        native_unit_of_measurement=PERCENTAGE, state_class=SensorStateClass.MEASUREMENT,
+    ),
+    *(
+        SensorEntityDescription(
+            key=f"{phase.key}_power_share", name=f"{phase.name} Power Share",
+            native_unit_of_measurement=PERCENTAGE, state_class=SensorStateClass.MEASUREMENT,
+        )
+        for phase in LINE_PHASES
+    ),
+    *(
+        SensorEntityDescription(
+            key=f"{phase.key}_reactive_ratio", name=f"{phase.name} Reactive Ratio",
+            state_class=SensorStateClass.MEASUREMENT,
+        )
+        for phase in PHASES
+    ),
+    *(
+        SensorEntityDescription(
+            key=f"{phase.key}_energy_rate", name=f"{phase.name} Energy Rate",
+            native_unit_of_measurement=UnitOfPower.WATT, device_class=SensorDeviceClass.POWER,
+            state_class=SensorStateClass.MEASUREMENT,
+        )
+        for phase in PHASES
+    ),
+)
+
+# kWh per second to W
+_KWH_PER_SECOND_TO_WATT = 3_600_000
+
+
+def imbalance(values):
+    """Return the largest deviation from the mean in percent of the mean."""
+    if None in values:
+        return None
+    mean = sum(values) / len(values)
+    if not mean:
+        return None
+    return round(max(abs(value - mean) for value in values) / abs(mean) * 100, 2)
+
+
+class EmonioDerivedMetrics:
+    """Compute derived metrics once per poll from one coherent snapshot.
+
+    The inputs of a metric are read from the same snapshot, so e.g. the
+    power shares always add up, unlike template sensors that each see the
+    states of the moment they are rendered. Inputs are fetched per quantity
+    across all phases with a single ``itemgetter`` on the snapshot.
+    """
+
+    def __init__(self, poller):
+        self.poller = poller
+        self.values = {description.key: None for description in DERIVED_SENSORS}
+        self._index = None
+        self._getters = {}
+        self._counters = None
+        self._counters_read_at = None
+
+    def register(self):
+        """Add every input register to the poller's read plan."""
+        for quantity in INPUT_QUANTITIES:
+            for phase in PHASES:
+                register = REGISTERS_BY_KEY[f"{phase.key}_{quantity}"]
+                self.poller.register(register.address, register.quantity.group)
+
+    def _getter(self, quantity, phases):
+        """Return a function picking ``quantity`` of ``phases`` out of a snapshot."""
+        index = self.poller.index
+        if index is not self._index:
+            # The slots moved because registers were added
+            self._index = index
+            self._getters = {}
+        key = (quantity, phases)
+        if key not in self._getters:
+            slots = [index[REGISTERS_BY_KEY[f"{phase.key}_{quantity}"].address] for phase in phases]
+            self._getters[key] = itemgetter(*slots)
+        return self._getters[key]
+
+    def update(self, data, groups=None):
+        """Recompute every metric from the snapshot ``data``.
+
+        ``groups`` are the poll groups read into it; the energy rate is only
+        updated when the counters were read.
+        """
+        values = self.values
+        values["voltage_imbalance"] = imbalance(self._getter("voltage", LINE_PHASES)(data))
+        values["current_imbalance"] = imbalance(self._getter("current", LINE_PHASES)(data))
+
+        powers = self._getter("power", PHASES)(data)
+        total_power = powers[-1]
+        for phase, power in zip(LINE_PHASES, powers):
+            share = None
+            if power is not None and total_power:
+                share = round(power / total_power * 100, 2)
+            values[f"{phase.key}_power_share"] = share
+
+        reactive = self._getter("apparent_power_reactive", PHASES)(data)
+        for phase, power, reactive_power in zip(PHASES, powers, reactive):
+            ratio = None
+            if reactive_power is not None and power:
+                ratio = round(reactive_power / power, 3)
+            values[f"{phase.key}_reactive_ratio"] = ratio
+
+        if groups is None or POLL_GROUP_ENERGY in groups:
+            self._update_energy_rate(self._getter("energy", PHASES)(data))
+        return values
+
+    def _update_energy_rate(self, counters):
+        now = time.monotonic()
+        previous, read_at = self._counters, self._counters_read_at
+        self._counters, self._counters_read_at = counters, now
+        if previous is None or now <= read_at:
+            return
+        elapsed = now - read_at
+        for phase, counter, last in zip(PHASES, counters, previous):
+            rate = None
+            # A counter that went backwards was reset; wait for the next reading
+            if counter is not None and last is not None and counter >= last:
+                rate = round((counter - last) * _KWH_PER_SECOND_TO_WATT / elapsed, 1)
+            self.values[f"{phase.key}_energy_rate"] = rate
@@ -0,0 +1,33 @@
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_POOL, DATA_PROFILER, DOMAIN
+
+
+def _coordinator_diagnostics(coordinator):
+    return {
+        "scan_intervals": coordinator.scan_intervals,
+        "state_writes": {
+            "published": coordinator.published_writes,
+            "suppressed": coordinator.suppressed_writes,
+        },
+        "metrics": coordinator.metrics.as_dict(),
+        "cache": coordinator.cache.as_dict(),
+        "counters": coordinator.counters.as_dict(),
+        "derived": None if coordinator.derived is None else coordinator.derived.values,
+    }
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "options": dict(entry.options),
+        "setup_time": data.get("setup_time"),
+        "units": {
+            unit: _coordinator_diagnostics(coordinator)
+            for unit, coordinator in data["coordinators"].items()
+        },
+        "pool": hass.data[DATA_POOL].stats,
+        "profile": hass.data[DATA_PROFILER].as_dict() if DATA_PROFILER in hass.data else None,
+    }
@@ -0,0 +1,155 @@
+import gzip
+import logging
+import os
+import time
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import EXPORT_BATCH_SIZE, EXPORT_FLUSH_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def write_batch(path, columns, rows):
+    """Append ``rows`` to a gzip compressed CSV file. Blocking."""
+    new_file = not os.path.exists(path)
+    # Every flush appends a gzip member; gzip readers concatenate them
+    with gzip.open(path, "at", encoding="ascii", newline="") as export:
+        if new_file:
+            export.write(",".join(("timestamp", *columns)) + "\n")
+        for timestamp, values in rows:
+            export.write(
+                f"{timestamp:.3f},"
+                + ",".join("" if value is None else f"{value:.6g}" for value in values)
+                + "\n"
+            )
+
+
+def read_columns(path):
+    """Return the columns of an export file, ``None`` if there is none. Blocking."""
+    try:
+        with gzip.open(path, "rt", encoding="ascii", newline="") as export:
+            return export.readline().rstrip("\n").split(",")[1:]
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, UnicodeDecodeError):
+        return []  # Unreadable, never append to it
+
+
+def enforce_retention(directory, prefix, max_bytes, current=None):
+    """Delete the oldest export files of a device until they fit ``max_bytes``. Blocking.
+
+    ``current`` is the file currently written to, by default the newest one.
+    """
+    files = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        # Not startswith(prefix): unit 1's prefix is the start of the other units' prefixes
+        if name.startswith(f"{prefix}-") and name.endswith(".csv.gz")
+    )
+    sizes = {path: os.path.getsize(path) for path in files}
+    total = sum(sizes.values())
+    if current is None and files:
+        current = files[-1]
+    for path in files:
+        if total <= max_bytes:
+            break
+        if path == current:
+            continue  # Never delete the file currently written to
+        os.remove(path)
+        total -= sizes[path]
+        _LOGGER.debug(f"Removed export file {path}")
+
+
+class EmonioExporter:
+    """Stream every snapshot of a device into hourly rotated CSV files.
+
+    Snapshots are batched in memory and written off the event loop, one
+    ``<prefix>-YYYYMMDDHH.csv.gz`` file per UTC hour. If that file was
+    started with other columns, e.g. before a reload that enabled more
+    sensors, the rest of the hour goes to ``<prefix>-YYYYMMDDHHMMSS.csv.gz``
+    instead. The oldest files are deleted once all files of the device
+    exceed ``max_bytes``.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator, directory, prefix, columns, max_bytes):
+        self.hass = hass
+        self.coordinator = coordinator
+        self.directory = directory
+        self.prefix = prefix
+        self.columns = columns
+        self.max_bytes = max_bytes
+        self.rows_written = 0
+        self._rows = []
+        self._last_flush = time.monotonic()
+        # Flush started by an update, awaited before closing
+        self._flush_task = None
+        # UTC hour -> file the rows of that hour are written to
+        self._paths = {}
+
+    @callback
+    def handle_update(self):
+        """Add the coordinator's current snapshot to the batch."""
+        if not self.coordinator.last_update_success or not self.coordinator.data:
+            return
+        # The poller reuses its value list, so keep a copy
+        self._rows.append((time.time(), tuple(self.coordinator.data)))
+        if (
+            len(self._rows) >= EXPORT_BATCH_SIZE
+            or time.monotonic() - self._last_flush >= EXPORT_FLUSH_INTERVAL
+        ) and self._flush_task is None:
+            self._flush_task = self.hass.async_create_task(self._async_flush_batch())
+
+    async def _async_flush_batch(self):
+        try:
+            await self.async_flush()
+        finally:
+            self._flush_task = None
+
+    async def async_flush(self):
+        """Write the batch to disk in the executor."""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        self._last_flush = time.monotonic()
+        try:
+            await self.hass.async_add_executor_job(self._write, rows)
+            self.rows_written += len(rows)
+        except OSError as e:
+            _LOGGER.error(f"Error exporting readings to {self.directory}: {e}")
+
+    def _write(self, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        # Rotate hourly (UTC); a batch spanning an hour boundary is split
+        by_file = {}
+        for row in rows:
+            hour = time.strftime("%Y%m%d%H", time.gmtime(row[0]))
+            by_file.setdefault(hour, []).append(row)
+        for hour, hour_rows in by_file.items():
+            write_batch(self._path(hour, hour_rows[0][0]), self.columns, hour_rows)
+        # Only the last hour can still get rows
+        last_hour = max(by_file)
+        self._paths = {last_hour: self._paths[last_hour]}
+        enforce_retention(self.directory, self.prefix, self.max_bytes, self._paths[last_hour])
+
+    def _path(self, hour, timestamp):
+        """Return the file for the rows of ``hour``, starting at ``timestamp``. Blocking."""
+        if hour not in self._paths:
+            path = os.path.join(self.directory, f"{self.prefix}-{hour}.csv.gz")
+            columns = read_columns(path)
+            if columns is not None and columns != list(self.columns):
+                # Never append rows under the header of other columns
+                started = time.strftime("%Y%m%d%H%M%S", time.gmtime(timestamp))
+                path = os.path.join(self.directory, f"{self.prefix}-{started}.csv.gz")
+            self._paths[hour] = path
+        return self._paths[hour]
+
+    async def async_close(self):
+        """Flush what is left, e.g. when the config entry is unloaded.
+
+        A flush still running is waited for first, so the rows batched while
+        it wrote are not lost and the files are never written concurrently.
+        """
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.async_flush()
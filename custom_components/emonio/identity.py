@@ -0,0 +1,50 @@
+import logging
+import time
+
+from .const import ARP_CACHE_TTL
+
+_LOGGER = logging.getLogger(__name__)
+
+PROC_NET_ARP = "/proc/net/arp"
+
+# Incomplete entries in /proc/net/arp have an all-zero hardware address
+_NO_MAC = "00:00:00:00:00:00"
+
+_arp_table = {}
+_arp_table_read = None
+
+
+def read_arp_table(path=PROC_NET_ARP):
+    """Parse the kernel ARP table into a ``{ip: mac}`` dict. Blocking."""
+    table = {}
+    with open(path, encoding="ascii") as arp:
+        next(arp, None)  # Header line
+        for line in arp:
+            fields = line.split()
+            if len(fields) >= 4 and fields[3] != _NO_MAC:
+                table[fields[0]] = fields[3].lower()
+    return table
+
+
+def lookup_mac_address(ip_address):
+    """Return the MAC address of ``ip_address`` from a cached ARP table. Blocking."""
+    global _arp_table, _arp_table_read
+    now = time.monotonic()
+    if _arp_table_read is None or now - _arp_table_read > ARP_CACHE_TTL or ip_address not in _arp_table:
+        try:
+            _arp_table = read_arp_table()
+        except OSError as e:
+            _LOGGER.debug(f"Unable to read {PROC_NET_ARP}: {e}")
+            _arp_table = {}
+        _arp_table_read = now
+    return _arp_table.get(ip_address)
+
+
+async def async_get_mac_address(hass, ip_address):
+    """Get the MAC address of a device by IP address without blocking the loop."""
+    return await hass.async_add_executor_job(lookup_mac_address, ip_address)
+
+
+def mac_suffix(mac_address):
+    """Return the short device id used in names and unique IDs."""
+    return mac_address.replace(':', '')[-6:].upper()
@@ -0,0 +1,79 @@
+import asyncio
+import bisect
+
+from .modbus import ModbusExceptionResponse
+
+# Upper bounds of the round-trip latency histogram buckets in milliseconds
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Request is 12 bytes; the response has a 9 byte header plus the registers
+_REQUEST_BYTES = 12
+_RESPONSE_HEADER_BYTES = 9
+
+
+class EmonioPollMetrics:
+    """Counters and a latency histogram for the Modbus traffic of one device."""
+
+    def __init__(self, modbus_client=None):
+        self._modbus_client = modbus_client
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.exception_responses = 0
+        self.decode_failures = 0
+        self.cycles = 0
+        self.failed_cycles = 0
+        self.last_latency = None
+        self.last_cycle_time = None
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def reconnects(self):
+        """Connections opened after the first one by the device's client."""
+        if self._modbus_client is None:
+            return 0
+        return max(0, self._modbus_client.connects - 1)
+
+    def record_request(self, count, latency, error=None):
+        """Record one block request of ``count`` registers."""
+        self.requests += 1
+        self.bytes_sent += _REQUEST_BYTES
+        if error is None:
+            self.bytes_received += _RESPONSE_HEADER_BYTES + count * 2
+            self.last_latency = latency
+            milliseconds = latency * 1000
+            self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+        elif isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+        elif isinstance(error, ModbusExceptionResponse):
+            self.exception_responses += 1
+        else:
+            self.errors += 1
+
+    def record_cycle(self, duration, success):
+        self.cycles += 1
+        self.last_cycle_time = duration
+        if not success:
+            self.failed_cycles += 1
+
+    def as_dict(self):
+        """Return all metrics, e.g. for the diagnostics download."""
+        buckets = [f"<={bound}ms" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}ms"]
+        return {
+            "requests": self.requests,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "exception_responses": self.exception_responses,
+            "decode_failures": self.decode_failures,
+            "reconnects": self.reconnects,
+            "circuit_open": self._modbus_client is not None and self._modbus_client.circuit_open,
+            "cycles": self.cycles,
+            "failed_cycles": self.failed_cycles,
+            "last_latency": self.last_latency,
+            "last_cycle_time": self.last_cycle_time,
+            "latency_histogram": dict(zip(buckets, self.latency_histogram)),
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import random
+import struct
+import time
+
+from .const import (
+    CIRCUIT_TIMEOUT_THRESHOLD,
+    DEFAULT_TIMEOUT,
+    RECONNECT_BACKOFF_MAX,
+    RECONNECT_BACKOFF_MIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+READ_HOLDING_REGISTERS = 0x03
+
+# Exception codes of a gateway that has no answer from the unit behind it
+GATEWAY_PATH_UNAVAILABLE = 0x0A
+GATEWAY_TARGET_FAILED = 0x0B
+
+# MBAP header: transaction id, protocol id, length, unit id
+_MBAP = struct.Struct(">HHHB")
+_READ_REQUEST = struct.Struct(">HHHBBHH")
+
+
+class ModbusError(Exception):
+    """Raised when a Modbus request fails."""
+
+
+class ModbusExceptionResponse(ModbusError):
+    """Raised when the device answers with a Modbus exception code."""
+
+    def __init__(self, function, code):
+        super().__init__(f"Function {function:#04x} returned exception code {code}")
+        self.function = function
+        self.code = code
+
+
+class CircuitOpenError(ModbusError):
+    """Raised instead of connecting while the device is known to be down."""
+
+
+class EmonioModbusClient:
+    """Minimal asyncio Modbus/TCP client with pipelined requests.
+
+    Every request gets its own transaction id, so several requests can be in
+    flight on the same connection and are matched to their responses as they
+    arrive. Nothing in here blocks the event loop.
+
+    Reconnects are serialized: failed connection attempts open a circuit
+    that fails requests immediately until an exponentially growing,
+    jittered backoff has passed. Repeated timeouts on an open connection
+    drop it and open the circuit as well.
+
+    Behind a gateway several unit ids share the connection. ``max_in_flight``
+    bounds the requests sent at once, handing out slots in request order so
+    every unit gets its turn. A single unit that stops answering is backed
+    off on its own while the connection stays open for the others; the
+    connection is only dropped once no unit known to answer still does.
+    """
+
+    def __init__(self, host, port, timeout=DEFAULT_TIMEOUT, max_in_flight=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = None
+        self._slots = None
+        if max_in_flight:
+            self.limit_in_flight(max_in_flight)
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._pending = {}
+        self._transaction_id = 0
+        self.connects = 0
+        self.failures = 0
+        self._retry_at = 0.0
+        # Consecutive timeouts and backoff per unit id
+        self._timeouts = {}
+        self._unit_failures = {}
+        self._unit_retry_at = {}
+        # Units whose last request was answered, kept across reconnects
+        self._answering = set()
+        self._connect_lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def circuit_open(self):
+        """Whether requests currently fail fast instead of reconnecting."""
+        return not self.connected and (self._closed or time.monotonic() < self._retry_at)
+
+    @property
+    def retry_in(self):
+        """Seconds until the next connection attempt is allowed."""
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def unit_retry_in(self, unit):
+        """Seconds until requests to a backed off unit are sent again, 0 if it answers."""
+        return max(0.0, self._unit_retry_at.get(unit, 0) - time.monotonic())
+
+    def limit_in_flight(self, max_in_flight):
+        """Allow at most ``max_in_flight`` requests on the connection at once."""
+        if self.max_in_flight is None or max_in_flight < self.max_in_flight:
+            self.max_in_flight = max_in_flight
+            # Waiters are woken in the order they arrived
+            self._slots = asyncio.Semaphore(max_in_flight)
+
+    @staticmethod
+    def _backoff(failures):
+        backoff = min(RECONNECT_BACKOFF_MAX, RECONNECT_BACKOFF_MIN * 2 ** (failures - 1))
+        return time.monotonic() + backoff * random.uniform(0.5, 1.0)
+
+    def _check_unit(self, unit):
+        if time.monotonic() < self._unit_retry_at.get(unit, 0):
+            raise CircuitOpenError(f"Unit {unit} at {self.host}:{self.port} is not answering")
+
+    def _back_off_unit(self, unit):
+        if time.monotonic() < self._unit_retry_at.get(unit, 0):
+            return  # Another request of this unit already backed it off
+        _LOGGER.debug(f"Unit {unit} at {self.host}:{self.port} stopped answering")
+        self._unit_failures[unit] = self._unit_failures.get(unit, 0) + 1
+        self._unit_retry_at[unit] = self._backoff(self._unit_failures[unit])
+
+    def _open_circuit(self):
+        self.failures += 1
+        self._retry_at = self._backoff(self.failures)
+
+    async def connect(self):
+        """Open the TCP connection if it is not open yet.
+
+        Raises ``CircuitOpenError`` while backing off after failed attempts.
+        """
+        async with self._connect_lock:
+            if self.connected:
+                return
+            if self._closed:
+                raise CircuitOpenError(f"Connection to {self.host}:{self.port} was closed")
+            if self.circuit_open:
+                raise CircuitOpenError(
+                    f"{self.host}:{self.port} is down, retrying in {self.retry_in:.0f} s"
+                )
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                self._open_circuit()
+                raise
+            self.failures = 0
+            self._timeouts.clear()
+            self._read_task = asyncio.get_running_loop().create_task(
+                self._read_loop(self._reader, self._writer)
+            )
+            self.connects += 1
+
+    async def close(self):
+        """Close the connection for good and fail all pending requests.
+
+        Requests still in flight, e.g. of a poll that outlived its entry,
+        can no longer reconnect the client.
+        """
+        self._closed = True
+        await self._disconnect()
+
+    async def _disconnect(self):
+        """Drop the connection; the next request reconnects."""
+        writer, self._writer = self._writer, None
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        self._fail_pending(ModbusError("Connection closed"))
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
+
+    async def read_holding_registers(self, address, count, unit=1, timeout=None):
+        """Read ``count`` holding registers and return a view of their raw big-endian bytes."""
+        self._check_unit(unit)
+        if self._slots is None:
+            return await self._read_holding_registers(address, count, unit, timeout)
+        async with self._slots:
+            # The unit may have been backed off while this request was queued
+            self._check_unit(unit)
+            return await self._read_holding_registers(address, count, unit, timeout)
+
+    async def _read_holding_registers(self, address, count, unit, timeout):
+        if not self.connected:
+            await self.connect()
+
+        self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+        transaction_id = self._transaction_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[transaction_id] = future
+        try:
+            self._writer.write(
+                _READ_REQUEST.pack(
+                    transaction_id, 0, 6, unit, READ_HOLDING_REGISTERS, address, count
+                )
+            )
+            function, payload = await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts[unit] = self._timeouts.get(unit, 0) + 1
+            if self._timeouts[unit] >= CIRCUIT_TIMEOUT_THRESHOLD and self.connected:
+                self._answering.discard(unit)
+                self._back_off_unit(unit)
+                if not self._answering:
+                    # No other unit is known to answer either
+                    _LOGGER.debug(f"{self.host}:{self.port} stopped answering, closing the connection")
+                    self._open_circuit()
+                    await self._disconnect()
+            raise
+        finally:
+            # Also covers timeouts and cancellation of the caller
+            self._pending.pop(transaction_id, None)
+
+        self._timeouts[unit] = 0
+        self._answering.add(unit)
+        if not payload:
+            raise ModbusError(f"Empty response to function {function:#04x}")
+        if function & 0x80:
+            if payload[0] in (GATEWAY_PATH_UNAVAILABLE, GATEWAY_TARGET_FAILED):
+                self._back_off_unit(unit)
+            raise ModbusExceptionResponse(function & 0x7F, payload[0])
+        self._unit_failures.pop(unit, None)
+        if payload[0] != count * 2 or len(payload) - 1 != payload[0]:
+            raise ModbusError(f"Expected {count * 2} bytes, got {len(payload) - 1} (byte count {payload[0]})")
+        return payload[1:]
+
+    async def _read_loop(self, reader, writer):
+        """Dispatch incoming responses to the request with the same transaction id."""
+        try:
+            while True:
+                header = await reader.readexactly(_MBAP.size)
+                transaction_id, _, length, _ = _MBAP.unpack(header)
+                if length < 2:
+                    # Not even a function code; the stream cannot be trusted any more
+                    _LOGGER.debug(f"Invalid response length {length} from {self.host}:{self.port}")
+                    break
+                pdu = await reader.readexactly(length - 1)
+                future = self._pending.get(transaction_id)
+                if future is None or future.done():
+                    _LOGGER.debug(f"Dropping response for unknown transaction {transaction_id}")
+                    continue
+                future.set_result((pdu[0], memoryview(pdu)[1:]))
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, OSError) as e:
+            _LOGGER.debug(f"Connection to {self.host}:{self.port} lost: {e}")
+        finally:
+            # After close() a new connection may already be open; leave it alone
+            if self._writer is writer:
+                self._writer = None
+                writer.close()
+                self._fail_pending(ModbusError(f"Connection to {self.host}:{self.port} lost"))
+
+    def _fail_pending(self, error):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
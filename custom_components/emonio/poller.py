@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import struct
+import time
+from functools import lru_cache
+
+from .const import MAX_BLOCK_GAP, MAX_BLOCK_REGISTERS
+from .modbus import CircuitOpenError
+
+_LOGGER = logging.getLogger(__name__)
+
+FLOAT32_REGISTERS = 2
+
+
+@lru_cache(maxsize=32)
+def build_read_plan(addresses, max_gap=MAX_BLOCK_GAP, max_registers=MAX_BLOCK_REGISTERS):
+    """Merge float32 register addresses into as few block reads as possible.
+
+    Returns a tuple of ``(start, count)`` tuples. Addresses separated by at
+    most ``max_gap`` unused registers are read in the same request, as long
+    as the block stays within ``max_registers``. ``addresses`` must be
+    hashable; plans are cached since every device shares the same layout.
+    """
+    plan = []
+    start = end = None
+    for address in sorted(set(addresses)):
+        last = address + FLOAT32_REGISTERS
+        if start is not None and address - end <= max_gap and last - start <= max_registers:
+            end = max(end, last)
+            continue
+        if start is not None:
+            plan.append((start, end - start))
+        start, end = address, last
+    if start is not None:
+        plan.append((start, end - start))
+    return tuple(plan)
+
+
+class BlockDecoder:
+    """Decode all float32 values of one register block in a single call.
+
+    The struct format is compiled once from the block layout: one ``f`` per
+    value and pad bytes for the registers in between. Word-swapped float32
+    values are little-endian floats once the two bytes of every register are
+    swapped, so the swap is a pair of slice copies into a reusable buffer.
+    """
+
+    __slots__ = ("start", "count", "slots", "_range", "_struct", "_buffer", "_swap")
+
+    def __init__(self, start, count, addresses, slots, swap="word"):
+        self.start = start
+        self.count = count
+        self.slots = slots
+        # Values of a block usually land in consecutive slots; use a slice then
+        self._range = None
+        if slots == list(range(slots[0], slots[0] + len(slots))):
+            self._range = slice(slots[0], slots[0] + len(slots))
+        self._swap = swap == "word"
+        layout = ["<" if self._swap else ">"]
+        offset = start
+        for address in addresses:
+            if address > offset:
+                layout.append(f"{(address - offset) * 2}x")
+            layout.append("f")
+            offset = address + FLOAT32_REGISTERS
+        self._struct = struct.Struct("".join(layout))
+        self._buffer = bytearray(count * 2)
+
+    def decode_into(self, data, values):
+        """Decode the raw block ``data`` into the slots of ``values``.
+
+        Raises ``struct.error`` if ``data`` is not exactly the block.
+        """
+        if len(data) != self.count * 2:
+            raise struct.error(f"Expected {self.count * 2} bytes, got {len(data)}")
+        if self._swap:
+            data = memoryview(data)
+            self._buffer[0::2] = data[1::2]
+            self._buffer[1::2] = data[0::2]
+            data = self._buffer
+        decoded = self._struct.unpack_from(data)
+        if self._range is not None:
+            values[self._range] = decoded
+        else:
+            for slot, value in zip(self.slots, decoded):
+                values[slot] = value
+
+    def clear(self, values):
+        """Mark the values of this block as unknown."""
+        for slot in self.slots:
+            values[slot] = None
+
+
+class EmonioPoller:
+    """Read the registers of one device with as few requests as possible.
+
+    Registers belong to a poll group, so a refresh can read only the groups
+    that are due; groups due together still share block requests.
+    """
+
+    def __init__(self, modbus_client, swap="word", unit=1, metrics=None, cache=None, max_age=None):
+        self._modbus_client = modbus_client
+        self.metrics = metrics
+        self.cache = cache
+        self.max_age = max_age
+        self._swap = swap
+        self._unit = unit
+        self._groups = {}
+        self._plans = {}
+        self.index = {}
+        self.values = []
+        # Step timer of a running profiling session
+        self.timer = None
+
+    def register(self, address, group=None):
+        """Add a float32 register to the read plan."""
+        self._groups[address] = group
+        self._plans = {}
+        addresses = sorted(self._groups)
+        self.index = {address: slot for slot, address in enumerate(addresses)}
+        self.values = [None] * len(addresses)
+
+    @property
+    def groups(self):
+        """Return the poll groups that have at least one register."""
+        return set(self._groups.values())
+
+    def addresses(self, group):
+        """Return the registered addresses of a poll group."""
+        return [address for address, address_group in self._groups.items() if address_group == group]
+
+    def plan(self, groups=None):
+        """Return the block decoders reading ``groups`` (all when ``None``)."""
+        key = None if groups is None else frozenset(groups)
+        if key not in self._plans:
+            addresses = sorted(
+                address for address, group in self._groups.items()
+                if key is None or group in key
+            )
+            plan = []
+            for start, count in build_read_plan(tuple(addresses)):
+                block = [a for a in addresses if start <= a < start + count]
+                plan.append(
+                    BlockDecoder(start, count, block, [self.index[a] for a in block], self._swap)
+                )
+            self._plans[key] = plan
+        return self._plans[key]
+
+    async def async_refresh(self, groups=None):
+        """Read the blocks of ``groups`` and decode them into ``values``.
+
+        The block requests are pipelined on the same connection. ``values``
+        is preallocated and reused across cycles, so registers that were not
+        due keep their last value; look values up through ``index``. Raises
+        ``CircuitOpenError`` without any I/O while the device is known to be
+        down and ``ConnectionError`` when no block could be read.
+        """
+        if self._modbus_client.circuit_open:
+            raise CircuitOpenError(f"Device is down, retrying in {self._modbus_client.retry_in:.0f} s")
+        retry_in = self._modbus_client.unit_retry_in(self._unit)
+        if retry_in:
+            raise CircuitOpenError(f"Unit {self._unit} is not answering, retrying in {retry_in:.0f} s")
+        plan = self.plan(groups)
+        results = await asyncio.gather(
+            *(self._read_block(block) for block in plan),
+            return_exceptions=True,
+        )
+
+        started = time.perf_counter()
+        decoded = 0
+        for block, result in zip(plan, results):
+            if isinstance(result, Exception):
+                # Fail-fast errors of a unit backed off during this refresh were already reported
+                log = _LOGGER.debug if isinstance(result, CircuitOpenError) else _LOGGER.error
+                log(f"Error reading registers {block.start}-{block.start + block.count - 1}: {result}")
+                block.clear(self.values)
+                continue
+            try:
+                block.decode_into(result, self.values)
+            except struct.error as e:
+                _LOGGER.error(f"Error decoding registers {block.start}-{block.start + block.count - 1}: {e}")
+                if self.metrics is not None:
+                    self.metrics.decode_failures += 1
+                block.clear(self.values)
+                continue
+            decoded += 1
+        if self.timer is not None:
+            self.timer.add("decode", time.perf_counter() - started, blocking=True)
+
+        if plan and not decoded:
+            raise ConnectionError("No register block could be read")
+        return self.values
+
+    async def _read_block(self, block):
+        if self.cache is None:
+            return await self._read_block_uncached(block)
+        return await self.cache.async_read(
+            lambda: self._read_block_uncached(block), self._unit, block.start, block.count, self.max_age
+        )
+
+    async def _read_block_uncached(self, block):
+        started = time.monotonic()
+        try:
+            result = await self._modbus_client.read_holding_registers(block.start, block.count, unit=self._unit)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.record_request(block.count, time.monotonic() - started, e)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_request(block.count, time.monotonic() - started)
+        if self.timer is not None:
+            self.timer.add("read", time.monotonic() - started)
+        return result
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+
+from .const import DEFAULT_MAX_CONCURRENT_POLLS
+from .modbus import EmonioModbusClient
+
+_LOGGER = logging.getLogger(__name__)
+
+# Fractional part of the golden ratio; consecutive multiples of it spread
+# evenly over [0, 1) without knowing how many devices will follow.
+_GOLDEN_RATIO = 0.6180339887498949
+
+
+class EmonioConnectionPool:
+    """Share Modbus connections and bound concurrent polls across all devices."""
+
+    def __init__(self, max_concurrent_polls=DEFAULT_MAX_CONCURRENT_POLLS):
+        self._clients = {}
+        self._references = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent_polls)
+        self._registered = 0
+        self.max_concurrent_polls = max_concurrent_polls
+        self.cycles = 0
+        self.active_polls = 0
+        self.last_cycle_time = None
+        self.max_cycle_time = 0.0
+        self.total_cycle_time = 0.0
+
+    def acquire(self, host, port, max_in_flight=None):
+        """Return the persistent client for ``(host, port)``, creating it if needed.
+
+        Every unit id behind the endpoint shares this one connection;
+        ``max_in_flight`` limits how many requests it carries at once.
+        """
+        key = (host, port)
+        if key not in self._clients:
+            self._clients[key] = EmonioModbusClient(host, port)
+            self._references[key] = 0
+        if max_in_flight:
+            self._clients[key].limit_in_flight(max_in_flight)
+        self._references[key] += 1
+        return self._clients[key]
+
+    async def async_release(self, host, port):
+        """Drop one reference to a client and close it when it is no longer used."""
+        key = (host, port)
+        if key not in self._clients:
+            return
+        self._references[key] -= 1
+        if self._references[key] <= 0:
+            del self._references[key]
+            await self._clients.pop(key).close()
+
+    def stagger_offset(self, interval):
+        """Return the start offset in seconds for the next registered device."""
+        offset = (self._registered * _GOLDEN_RATIO) % 1
+        self._registered += 1
+        return offset * interval.total_seconds()
+
+    async def async_poll(self, poll):
+        """Run ``poll()`` once a slot is free and record how long it took."""
+        async with self._semaphore:
+            self.active_polls += 1
+            start = time.monotonic()
+            try:
+                return await poll()
+            finally:
+                self.active_polls -= 1
+                self._record_cycle(time.monotonic() - start)
+
+    def _record_cycle(self, duration):
+        self.cycles += 1
+        self.last_cycle_time = duration
+        self.total_cycle_time += duration
+        self.max_cycle_time = max(self.max_cycle_time, duration)
+
+    @property
+    def stats(self):
+        """Return aggregate poll statistics over all devices."""
+        return {
+            "connections": len(self._clients),
+            "max_concurrent_polls": self.max_concurrent_polls,
+            "active_polls": self.active_polls,
+            "cycles": self.cycles,
+            "last_cycle_time": self.last_cycle_time,
+            "mean_cycle_time": self.total_cycle_time / self.cycles if self.cycles else None,
+            "max_cycle_time": self.max_cycle_time,
+        }
+
+    async def async_close(self):
+        """Close every pooled connection."""
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+        self._references.clear()
@@ -0,0 +1,209 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, PROFILE_MAX_EVENTS, PROFILE_STACK_DEPTH, PROFILE_TOP_FUNCTIONS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EmonioStepTimer:
+    """Timings of the update steps of one device while it is profiled.
+
+    Steps run synchronously on the event loop (``blocking``) are flagged
+    when they take longer than the profiler's threshold; the others only
+    wait for I/O and are just timed.
+    """
+
+    def __init__(self, profiler, device):
+        self.profiler = profiler
+        self.device = device
+        self.cycles = 0
+        # step -> [count, total seconds, max seconds]
+        self.steps = {}
+
+    def add(self, step, duration, blocking=False):
+        stats = self.steps.setdefault(step, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] = max(stats[2], duration)
+        if blocking and duration > self.profiler.threshold:
+            self.profiler.slow_steps.append({
+                "at": dt_util.utcnow().isoformat(),
+                "device": self.device,
+                "step": step,
+                "duration_ms": round(duration * 1000, 1),
+            })
+
+    def cycle(self):
+        """Count a completed poll cycle."""
+        self.cycles += 1
+        self.profiler.check_done()
+
+    def as_dict(self):
+        return {
+            "cycles": self.cycles,
+            "steps": {
+                step: {
+                    "count": count,
+                    "mean_ms": round(total / count * 1000, 3),
+                    "max_ms": round(maximum * 1000, 3),
+                }
+                for step, (count, total, maximum) in self.steps.items()
+            },
+        }
+
+
+class _LoopWatchdog(threading.Thread):
+    """Catch anything holding the event loop, with the stack it is stuck in.
+
+    The loop bumps a heartbeat every quarter of the threshold; once the
+    heartbeat is older than the threshold, this thread samples the loop
+    thread's stack and keeps updating the stall's duration until the loop
+    runs again.
+    """
+
+    def __init__(self, hass: HomeAssistant, threshold, stalls):
+        super().__init__(name=f"{DOMAIN} loop watchdog", daemon=True)
+        self._loop = hass.loop
+        # Created on the event loop
+        self._loop_thread = threading.get_ident()
+        self._threshold = threshold
+        self._interval = threshold / 4
+        self._halt = threading.Event()
+        self._handle = None
+        self._beat = time.monotonic()
+        self.stalls = stalls
+
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self._interval, self._heartbeat)
+
+    def start(self):
+        self._heartbeat()
+        super().start()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._halt.set()
+
+    def run(self):
+        stall = None
+        while not self._halt.wait(self._interval):
+            held = time.monotonic() - self._beat - self._interval
+            if held <= self._threshold:
+                stall = None
+                continue
+            if stall is None:
+                frame = sys._current_frames().get(self._loop_thread)
+                stall = {
+                    "at": dt_util.utcnow().isoformat(),
+                    "stack": [] if frame is None else traceback.format_stack(frame)[-PROFILE_STACK_DEPTH:],
+                }
+                self.stalls.append(stall)
+            stall["duration_ms"] = round(held * 1000, 1)
+
+
+class EmonioProfiler:
+    """Profile the update path of every meter for a number of poll cycles.
+
+    While running, each meter's poll, read, decode, processing and publish
+    steps are timed, and the synchronous ones holding the event loop longer
+    than ``threshold`` seconds are flagged. A watchdog thread flags anything
+    else holding the loop that long, so a lagging UI can be told apart from
+    the integration. cProfile runs for the whole session, which ends once
+    every meter completed ``cycles`` polls or after ``timeout`` seconds; its
+    stats are written to ``path`` and summarized in the diagnostics.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinators, cycles, threshold, path):
+        self.hass = hass
+        self.coordinators = coordinators
+        self.cycles = cycles
+        self.threshold = threshold
+        self.path = path
+        self.timers = {device: EmonioStepTimer(self, device) for device in coordinators}
+        self.slow_steps = deque(maxlen=PROFILE_MAX_EVENTS)
+        self.stalls = deque(maxlen=PROFILE_MAX_EVENTS)
+        self.started = None
+        self.finished = None
+        self.timed_out = False
+        self.summary = None
+        self._profile = cProfile.Profile()
+        self._watchdog = _LoopWatchdog(hass, threshold, self.stalls)
+        self._done = asyncio.Event()
+
+    @property
+    def running(self):
+        return self.started is not None and self.finished is None
+
+    def start(self):
+        """Attach the timers and start profiling."""
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # Another profiler, e.g. Home Assistant's, is already running
+            raise HomeAssistantError(f"Unable to start profiling: {e}") from e
+        for device, coordinator in self.coordinators.items():
+            coordinator.set_timer(self.timers[device])
+        self._watchdog.start()
+        self.started = dt_util.utcnow()
+        _LOGGER.info(f"Profiling {len(self.coordinators)} meters for {self.cycles} poll cycles")
+
+    def check_done(self):
+        if all(timer.cycles >= self.cycles for timer in self.timers.values()):
+            self._done.set()
+
+    async def async_run(self, timeout):
+        """Profile until every meter was polled often enough, then write the stats."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out = True
+        finally:
+            self._profile.disable()
+            self._watchdog.stop()
+            for coordinator in self.coordinators.values():
+                coordinator.set_timer(None)
+            self.finished = dt_util.utcnow()
+        try:
+            self.summary = await self.hass.async_add_executor_job(self._write_stats)
+        except OSError as e:
+            _LOGGER.error(f"Error writing profile to {self.path}: {e}")
+            return
+        _LOGGER.info(f"Wrote profile of the Emonio update path to {self.path}")
+
+    def _write_stats(self):
+        """Write the cProfile stats and return the top functions. Blocking."""
+        self._profile.dump_stats(self.path)
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+        return stream.getvalue().splitlines()
+
+    def as_dict(self):
+        """Return the results so far, e.g. for the diagnostics download."""
+        return {
+            "started": None if self.started is None else self.started.isoformat(),
+            "finished": None if self.finished is None else self.finished.isoformat(),
+            "timed_out": self.timed_out,
+            "cycles": self.cycles,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "path": self.path,
+            "devices": {device: timer.as_dict() for device, timer in self.timers.items()},
+            "slow_steps": list(self.slow_steps),
+            "loop_stalls": list(self.stalls),
+            "profile": self.summary,
+        }
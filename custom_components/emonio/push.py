@@ -0,0 +1,123 @@
+import json
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import PUSH_DEBOUNCE, PUSH_TIMEOUT
+from .registers import REGISTERS_BY_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_message(topic, payload):
+    """Return ``{register key: value}`` of one pushed message.
+
+    A JSON object maps register keys to values, e.g.
+    ``{"phase_a_power": 1021.5, "total_power": 3010.2}``. Any other payload
+    is a single value for the register named by the last topic level, e.g.
+    ``1021.5`` on ``emonio/a1b2c3/phase_a_power``.
+    """
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return {}
+    if isinstance(data, dict):
+        readings = data.items()
+    else:
+        readings = ((topic.rsplit("/", 1)[-1], data),)
+    values = {}
+    for key, value in readings:
+        if key not in REGISTERS_BY_KEY or isinstance(value, bool):
+            continue
+        try:
+            values[key] = float(value)
+        except (TypeError, ValueError):
+            continue
+    return values
+
+
+class EmonioPushReceiver:
+    """Feed readings the device pushes over MQTT into the coordinator.
+
+    Pushed values are collected for ``PUSH_DEBOUNCE`` seconds, so a
+    snapshot pushed as one message per register is written into the
+    poller's snapshot and fanned out to the entities once. Poll groups
+    whose registers all arrived within ``PUSH_TIMEOUT`` are not polled;
+    once the stream stops they are read over Modbus again.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator, topic):
+        self.hass = hass
+        self.coordinator = coordinator
+        self.topic = topic
+        self.messages = 0
+        self._received_at = {}
+        self._unsubscribe = None
+        # slot -> value and poll groups pushed since the last flush
+        self._pending = {}
+        self._pending_groups = set()
+        self._flush_handle = None
+
+    async def async_start(self):
+        """Subscribe to the topic; returns ``False`` if MQTT is not available."""
+        from homeassistant.components import mqtt
+
+        if not await mqtt.async_wait_for_mqtt_client(self.hass):
+            _LOGGER.error(f"MQTT is not available, polling {self.coordinator.host} instead")
+            return False
+        self._unsubscribe = await mqtt.async_subscribe(
+            self.hass, self.topic, self._message_received, encoding=None
+        )
+        return True
+
+    @callback
+    def async_stop(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    @callback
+    def _message_received(self, message):
+        readings = parse_message(message.topic, message.payload)
+        index = self.coordinator.poller.index
+        now = time.monotonic()
+        received = False
+        for key, value in readings.items():
+            register = REGISTERS_BY_KEY[key]
+            slot = index.get(register.address)
+            if slot is None:
+                continue  # Sensor disabled
+            self._pending[slot] = value
+            self._received_at[register.address] = now
+            self._pending_groups.add(register.quantity.group)
+            received = True
+        if not received:
+            return
+        self.messages += 1
+        if self._flush_handle is None:
+            self._flush_handle = self.hass.loop.call_later(PUSH_DEBOUNCE, self._flush)
+
+    @callback
+    def _flush(self):
+        """Publish the values pushed since the last flush as one update."""
+        self._flush_handle = None
+        values = self.coordinator.poller.values
+        for slot, value in self._pending.items():
+            values[slot] = value
+        groups, self._pending, self._pending_groups = self._pending_groups, {}, set()
+        self.coordinator.process_snapshot(values, groups)
+        if self.coordinator.last_update_success:
+            self.coordinator.async_update_listeners()
+
+    def covers(self, group, now=None):
+        """Whether every register of ``group`` was pushed recently."""
+        now = time.monotonic() if now is None else now
+        addresses = self.coordinator.poller.addresses(group)
+        return bool(addresses) and all(
+            address in self._received_at and now - self._received_at[address] < PUSH_TIMEOUT
+            for address in addresses
+        )
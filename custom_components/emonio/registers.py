@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+from homeassistant.const import (
+    POWER_VOLT_AMPERE_REACTIVE,
+    UnitOfApparentPower,
+    UnitOfElectricCurrent,
+    UnitOfElectricPotential,
+    UnitOfEnergy,
+    UnitOfFrequency,
+    UnitOfPower,
+)
+
+from .const import POLL_GROUP_ELECTRICAL, POLL_GROUP_ENERGY, POLL_GROUP_POWER
+
+
+@dataclass(frozen=True)
+class EmonioQuantity:
+    """A measured quantity and its register offset inside a phase block."""
+
+    key: str
+    name: str
+    offset: int
+    unit: str
+    device_class: SensorDeviceClass
+    group: str
+    state_class: SensorStateClass = SensorStateClass.MEASUREMENT
+    data_type: str = "float32"
+    swap: str = "word"
+    # A new state is only written once the value moves by more than the
+    # larger of the absolute deadband and the relative one (a fraction of
+    # the last written value).
+    deadband: float = 0.0
+    deadband_relative: float = 0.0
+    # Read at the high sampling rate when sampling is enabled
+    sampled: bool = False
+
+
+@dataclass(frozen=True)
+class EmonioPhase:
+    """A block of registers holding every quantity for one phase."""
+
+    key: str
+    name: str
+    base: int
+
+
+@dataclass(frozen=True)
+class EmonioRegister:
+    """One register of the device, i.e. one quantity of one phase."""
+
+    quantity: EmonioQuantity
+    phase: EmonioPhase
+
+    @property
+    def key(self):
+        return f"{self.phase.key}_{self.quantity.key}"
+
+    @property
+    def name(self):
+        return f"{self.phase.name} {self.quantity.name}"
+
+    @property
+    def address(self):
+        return self.phase.base + self.quantity.offset
+
+
+QUANTITIES = (
+    EmonioQuantity(
+        "voltage", "Voltage", 0, UnitOfElectricPotential.VOLT,
+        SensorDeviceClass.VOLTAGE, POLL_GROUP_ELECTRICAL,
+        deadband=0.1,
+    ),
+    EmonioQuantity(
+        "power", "Power", 4, UnitOfPower.WATT,
+        SensorDeviceClass.POWER, POLL_GROUP_POWER,
+        deadband=1.0, deadband_relative=0.005, sampled=True,
+    ),
+    EmonioQuantity(
+        "energy", "Energy", 12, UnitOfEnergy.KILO_WATT_HOUR,
+        SensorDeviceClass.ENERGY, POLL_GROUP_ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    EmonioQuantity(
+        "current", "Current", 2, UnitOfElectricCurrent.AMPERE,
+        SensorDeviceClass.CURRENT, POLL_GROUP_ELECTRICAL,
+        deadband=0.01, deadband_relative=0.005, sampled=True,
+    ),
+    EmonioQuantity(
+        "apparent_power_reactive", "Apparent Power Reactive", 6, POWER_VOLT_AMPERE_REACTIVE,
+        SensorDeviceClass.REACTIVE_POWER, POLL_GROUP_POWER,
+        deadband=1.0, deadband_relative=0.005,
+    ),
+    EmonioQuantity(
+        "apparent_power", "Apparent Power", 8, UnitOfApparentPower.VOLT_AMPERE,
+        SensorDeviceClass.APPARENT_POWER, POLL_GROUP_POWER,
+        deadband=1.0, deadband_relative=0.005,
+    ),
+    EmonioQuantity(
+        "frequency", "Frequency", 10, UnitOfFrequency.HERTZ,
+        SensorDeviceClass.FREQUENCY, POLL_GROUP_ELECTRICAL,
+        deadband=0.01,
+    ),
+    EmonioQuantity(
+        "power_factor", "Power Factor", 14, "%",
+        SensorDeviceClass.POWER_FACTOR, POLL_GROUP_POWER,
+        deadband=0.5,
+    ),
+)
+
+PHASES = (
+    EmonioPhase("phase_a", "Phase A", 0),
+    EmonioPhase("phase_b", "Phase B", 100),
+    EmonioPhase("phase_c", "Phase C", 200),
+    EmonioPhase("total", "Total", 300),
+)
+
+# Every register of the device, built once at import time
+REGISTERS = tuple(
+    EmonioRegister(quantity, phase) for quantity in QUANTITIES for phase in PHASES
+)
+REGISTERS_BY_KEY = {register.key: register for register in REGISTERS}
+REGISTERS_BY_ADDRESS = {register.address: register for register in REGISTERS}
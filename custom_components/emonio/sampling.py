@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import math
+import time
+from array import array
+
+_LOGGER = logging.getLogger(__name__)
+
+_NAN = float("nan")
+
+
+class EmonioSampler:
+    """Sample a few registers at a high rate and aggregate them per publish window.
+
+    Samples are kept in one preallocated ``array`` holding a ring of
+    ``capacity`` samples per channel, so sampling does not allocate per
+    value. At each publish the window is reduced to mean, min, max and last
+    value per channel and the ring starts over.
+    """
+
+    def __init__(self, poller, interval, capacity):
+        self.poller = poller
+        self.interval = interval
+        self.capacity = capacity
+        self.window = 0
+        self._channels = 0
+        self._position = 0
+        self._count = 0
+        self._samples = array("d")
+        self.mean = array("d")
+        self.minimum = array("d")
+        self.maximum = array("d")
+        self.last = array("d")
+
+    def _allocate(self):
+        self._channels = len(self.poller.index)
+        size = self._channels * self.capacity
+        self._samples = array("d", [_NAN]) * size
+        self.mean = array("d", [_NAN]) * self._channels
+        self.minimum = array("d", [_NAN]) * self._channels
+        self.maximum = array("d", [_NAN]) * self._channels
+        self.last = array("d", [_NAN]) * self._channels
+        self._position = 0
+        self._count = 0
+
+    def append(self, values):
+        """Store one sample of every channel in the ring."""
+        if len(values) != self._channels:
+            self._allocate()
+        samples = self._samples
+        capacity = self.capacity
+        position = self._position
+        for channel, value in enumerate(values):
+            samples[channel * capacity + position] = _NAN if value is None else value
+        self._position = (position + 1) % capacity
+        self._count = min(self._count + 1, capacity)
+
+    def summarize(self):
+        """Reduce the current window into ``mean``/``minimum``/``maximum``/``last``."""
+        count = self._count
+        self.window = count
+        last_position = (self._position - 1) % self.capacity
+        view = memoryview(self._samples)
+        for channel in range(self._channels):
+            base = channel * self.capacity
+            # After a reset the ring fills from position 0, so the window
+            # is always the first ``count`` samples of the channel.
+            window = view[base:base + count]
+            if any(math.isnan(value) for value in window):
+                window = [value for value in window if not math.isnan(value)]
+            if not window:
+                self.mean[channel] = self.minimum[channel] = _NAN
+                self.maximum[channel] = self.last[channel] = _NAN
+                continue
+            self.mean[channel] = math.fsum(window) / len(window)
+            self.minimum[channel] = min(window)
+            self.maximum[channel] = max(window)
+            self.last[channel] = self._samples[base + last_position]
+        self._position = 0
+        self._count = 0
+
+    def summary(self, address):
+        """Return ``(mean, min, max, last)`` of the last window for a register."""
+        channel = self.poller.index.get(address)
+        if channel is None or channel >= self._channels or not self.window:
+            return None
+        mean = self.mean[channel]
+        if math.isnan(mean):
+            return None
+        return mean, self.minimum[channel], self.maximum[channel], self.last[channel]
+
+    async def async_run(self):
+        """Sample until cancelled."""
+        while True:
+            started = time.monotonic()
+            try:
+                self.append(await self.poller.async_refresh())
+            except Exception as e:
+                _LOGGER.debug(f"Error sampling registers: {e}")
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - started)))
@@ -1,69 +1,161 @@
-import voluptuous as vol
-import ipaddress
-from datetime import timedelta
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.const import (
-    UnitOfEnergy,
-    UnitOfPower,
-    UnitOfElectricPotential,
-    UnitOfElectricCurrent,
-    UnitOfFrequency,
-    POWER_VOLT_AMPERE_REACTIVE,
-    UnitOfApparentPower
-)
-from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
-from pymodbus.client.sync import ModbusTcpClient
-from pymodbus.payload import BinaryPayloadDecoder
-from pymodbus.constants import Endian
-from homeassistant.helpers.device_registry import DeviceEntryType
-from homeassistant.helpers import config_validation as cv
+from dataclasses import dataclass
+from typing import Callable
+
+from homeassistant.components.sensor import RestoreSensor, SensorEntity, SensorEntityDescription, SensorStateClass
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN, EntityCategory, UnitOfTime
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.core import callback
 import logging
-import asyncio
-import subprocess
-from .const import DOMAIN
+import time
+from .const import (
+    CONF_EXPORT_MAX_SIZE,
+    CONF_EXPORT_PATH,
+    CONF_IMPORT_STATISTICS,
+    CONF_PUSH_TOPIC,
+    DATA_POOL,
+    DATA_SITE,
+    DEFAULT_EXPORT_MAX_SIZE,
+    DEFAULT_IMPORT_STATISTICS,
+    DOMAIN,
+    MAX_STATE_AGE,
+)
+from .derived import DERIVED_SENSORS
+from .exporter import EmonioExporter
+from .push import EmonioPushReceiver
+from .registers import REGISTERS, REGISTERS_BY_ADDRESS
+from .site import SITE_ENERGY, SITE_SENSORS
+from .statistics import EmonioStatisticsImporter
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=5)
+def _milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
 
-CONFIG_SCHEMA = vol.Schema({
-    DOMAIN: cv.config_entry_only_config_schema,
-}, extra=vol.ALLOW_EXTRA)
+@dataclass(frozen=True, kw_only=True)
+class EmonioSensorEntityDescription(SensorEntityDescription):
+    """Static metadata of one register sensor, shared by the sensors of every device."""
+
+    address: int
+    group: str
+    deadband: float = 0.0
+    deadband_relative: float = 0.0
+    sampled: bool = False
 
-async def get_mac_address(ip_address):
-    """Get the MAC address of a device by IP address asynchronously."""
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            'arp', '-n', ip_address,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = await proc.communicate()
-        if stderr:
-            _LOGGER.error(f"Error getting MAC address for {ip_address}: {stderr.decode()}")
-            return None
 
-        stdout = stdout.decode()
-        for line in stdout.split('\n'):
-            if ip_address in line:
-                return line.split()[2]
+@dataclass(frozen=True, kw_only=True)
+class EmonioDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Static metadata of one poll metric sensor."""
 
-        return None
-    except Exception as e:
-        _LOGGER.error(f"Error getting MAC address for {ip_address}: {e}")
-        return None
+    value_fn: Callable
+    entity_category: EntityCategory = EntityCategory.DIAGNOSTIC
+
+
+# One description per register, built once for all devices
+REGISTER_SENSORS = tuple(
+    EmonioSensorEntityDescription(
+        key=register.key,
+        name=register.name,
+        native_unit_of_measurement=register.quantity.unit,
+        device_class=register.quantity.device_class,
+        state_class=register.quantity.state_class,
+        address=register.address,
+        group=register.quantity.group,
+        deadband=register.quantity.deadband,
+        deadband_relative=register.quantity.deadband_relative,
+        sampled=register.quantity.sampled,
+    )
+    for register in REGISTERS
+)
+
+# Poll metrics exposed as diagnostic sensors. Those changing on every poll
+# are disabled by default, so they do not add a recorded state per tick.
+DIAGNOSTIC_SENSORS = (
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_latency", name="Poll Latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS, state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda metrics: _milliseconds(metrics.last_latency),
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_cycle_time", name="Poll Cycle Time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS, state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda metrics: _milliseconds(metrics.last_cycle_time),
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_requests", name="Poll Requests",
+        state_class=SensorStateClass.TOTAL_INCREASING, entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.requests,
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_bytes", name="Poll Bytes",
+        native_unit_of_measurement="B", state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.bytes_sent + metrics.bytes_received,
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_timeouts", name="Poll Timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING, entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.timeouts,
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_errors", name="Poll Errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.errors + metrics.exception_responses + metrics.timeouts,
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_reconnects", name="Poll Reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING, entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.reconnects,
+    ),
+    EmonioDiagnosticSensorEntityDescription(
+        key="poll_decode_failures", name="Poll Decode Failures",
+        state_class=SensorStateClass.TOTAL_INCREASING, entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.decode_failures,
+    ),
+)
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Emonio Modbus sensor platform."""
-    host = config_entry.data["host"]
-    port = config_entry.data.get("port", 502)
+    coordinators = hass.data[DOMAIN][config_entry.entry_id]["coordinators"]
+    suffixes = hass.data[DOMAIN][config_entry.entry_id]["suffixes"]
+    sensors = []
+    for unit, coordinator in coordinators.items():
+        sensors.extend(_setup_device(hass, coordinator, suffixes[unit]))
+
+    hass.data[DOMAIN][config_entry.entry_id]["entities"] = sensors  # Store entities
+    # Entities start with their restored states; the first read runs in the
+    # background so slow meters do not hold up Home Assistant's startup
+    async_add_entities(sensors)
+
+    for unit, coordinator in coordinators.items():
+        _setup_consumers(hass, config_entry, coordinator, suffixes[unit])
+        coordinator.async_create_background_task(
+            config_entry,
+            _async_first_refresh(hass, coordinator),
+            f"{DOMAIN} first refresh {coordinator.host} unit {coordinator.unit}",
+        )
 
-    mac_address = await get_mac_address(host)
-    if not mac_address:
-        _LOGGER.error(f"Could not get MAC address for {host}")
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """Set up the site total sensors, loaded by the component when enabled."""
+    if discovery_info is None:
         return
-    mac_suffix = mac_address.replace(':', '')[-6:].upper()
+    coordinator = hass.data[DATA_SITE]
+    async_add_entities(
+        (EmonioSiteEnergySensor if description.key == SITE_ENERGY else EmonioSiteSensor)(coordinator, description)
+        for description in SITE_SENSORS
+    )
 
+async def _async_first_refresh(hass, coordinator):
+    """Read the device once, then shift its polling phase."""
+    await coordinator.async_refresh()
+    # Spread the devices over the scan interval so they don't all poll on the same tick
+    coordinator.stagger(hass.data[DATA_POOL].stagger_offset(coordinator.update_interval))
+
+def _setup_device(hass, coordinator, mac_suffix):
+    """Create the sensors of one device and add their registers to its read plan."""
     device_info = {
         "identifiers": {(DOMAIN, mac_suffix)},
         "name": f"Emonio P3 {mac_suffix}",
@@ -71,471 +163,253 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         "manufacturer": "Berliner Energie Institut",
     }
 
-    # Create a shared Modbus client
-    modbus_client = ModbusTcpClient(host, port)
-
-    # Sensors definitions
-    sensors = [
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Voltage",
-            unit_of_measurement=UnitOfElectricPotential.VOLT,
-            address=0,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.VOLTAGE,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_voltage",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Voltage",
-            unit_of_measurement=UnitOfElectricPotential.VOLT,
-            address=100,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.VOLTAGE,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_voltage",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Voltage",
-            unit_of_measurement=UnitOfElectricPotential.VOLT,
-            address=200,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.VOLTAGE,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_voltage",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Voltage",
-            unit_of_measurement=UnitOfElectricPotential.VOLT,
-            address=300,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.VOLTAGE,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_voltage",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Power",
-            unit_of_measurement=UnitOfPower.WATT,
-            address=4,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Power",
-            unit_of_measurement=UnitOfPower.WATT,
-            address=104,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Power",
-            unit_of_measurement=UnitOfPower.WATT,
-            address=204,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Power",
-            unit_of_measurement=UnitOfPower.WATT,
-            address=304,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Energy",
-            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-            address=12,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.ENERGY,
-            state_class=SensorStateClass.TOTAL,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_energy",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Energy",
-            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-            address=112,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.ENERGY,
-            state_class=SensorStateClass.TOTAL,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_energy",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Energy",
-            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-            address=212,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.ENERGY,
-            state_class=SensorStateClass.TOTAL,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_energy",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Energy",
-            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-            address=312,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.ENERGY,
-            state_class=SensorStateClass.TOTAL,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_energy",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Current",
-            unit_of_measurement=UnitOfElectricCurrent.AMPERE,
-            address=2,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.CURRENT,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_current",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Current",
-            unit_of_measurement=UnitOfElectricCurrent.AMPERE,
-            address=102,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.CURRENT,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_current",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Current",
-            unit_of_measurement=UnitOfElectricCurrent.AMPERE,
-            address=202,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.CURRENT,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_current",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Current",
-            unit_of_measurement=UnitOfElectricCurrent.AMPERE,
-            address=302,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.CURRENT,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_current",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Apparent Power Reactive",
-            unit_of_measurement=POWER_VOLT_AMPERE_REACTIVE,
-            address=6,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.REACTIVE_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_apparent_power_reactive",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Apparent Power Reactive",
-            unit_of_measurement=POWER_VOLT_AMPERE_REACTIVE,
-            address=106,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.REACTIVE_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_apparent_power_reactive",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Apparent Power Reactive",
-            unit_of_measurement=POWER_VOLT_AMPERE_REACTIVE,
-            address=206,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.REACTIVE_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_apparent_power_reactive",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Apparent Power Reactive",
-            unit_of_measurement=POWER_VOLT_AMPERE_REACTIVE,
-            address=306,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.REACTIVE_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_apparent_power_reactive",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Apparent Power",
-            unit_of_measurement=UnitOfApparentPower.VOLT_AMPERE,
-            address=8,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.APPARENT_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_apparent_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Apparent Power",
-            unit_of_measurement=UnitOfApparentPower.VOLT_AMPERE,
-            address=108,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.APPARENT_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_apparent_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Apparent Power",
-            unit_of_measurement=UnitOfApparentPower.VOLT_AMPERE,
-            address=208,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.APPARENT_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_apparent_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Apparent Power",
-            unit_of_measurement=UnitOfApparentPower.VOLT_AMPERE,
-            address=308,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.APPARENT_POWER,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_apparent_power",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Frequency",
-            unit_of_measurement=UnitOfFrequency.HERTZ,
-            address=10,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.FREQUENCY,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_frequency",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Frequency",
-            unit_of_measurement=UnitOfFrequency.HERTZ,
-            address=110,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.FREQUENCY,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_frequency",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Frequency",
-            unit_of_measurement=UnitOfFrequency.HERTZ,
-            address=210,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.FREQUENCY,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_frequency",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Frequency",
-            unit_of_measurement=UnitOfFrequency.HERTZ,
-            address=310,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.FREQUENCY,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_frequency",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase A Power Factor",
-            unit_of_measurement="%",
-            address=14,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER_FACTOR,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_a_power_factor",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase B Power Factor",
-            unit_of_measurement="%",
-            address=114,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER_FACTOR,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_b_power_factor",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Phase C Power Factor",
-            unit_of_measurement="%",
-            address=214,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER_FACTOR,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_phase_c_power_factor",
-            device_info=device_info,
-        ),
-        EmonioModbusSensor(
-            name=f"Emonio {mac_suffix} Total Power Factor",
-            unit_of_measurement="%",
-            address=314,
-            data_type="float32",
-            swap="word",
-            device_class=SensorDeviceClass.POWER_FACTOR,
-            state_class=SensorStateClass.MEASUREMENT,
-            modbus_client=modbus_client,
-            unique_id=f"{mac_suffix}_emonio_total_power_factor",
-            device_info=device_info,
-        ),
-    ]
+    # Sensors are generated from the register map. Registers of entities
+    # disabled in the entity registry are left out of the read plan.
+    entity_registry = er.async_get(hass)
+    sensors = []
+    for description in REGISTER_SENSORS:
+        sensor = EmonioModbusSensor(coordinator, description, mac_suffix, device_info)
+        entity_id = entity_registry.async_get_entity_id("sensor", DOMAIN, sensor.unique_id)
+        entry = entity_registry.async_get(entity_id) if entity_id else None
+        if entry is None or not entry.disabled:
+            coordinator.poller.register(description.address, description.group)
+            if coordinator.sampler is not None and description.sampled:
+                coordinator.sampler.poller.register(description.address)
+        sensors.append(sensor)
 
-    hass.data[DOMAIN][config_entry.entry_id]["entities"] = sensors  # Store entities
-    async_add_entities(sensors, True)
-
-class EmonioModbusSensor(SensorEntity):
-    def __init__(self, name, unit_of_measurement, address, data_type, swap, device_class, state_class, modbus_client, unique_id, device_info):
-        self._name = name
-        self._unit_of_measurement = unit_of_measurement
-        self._address = address
-        self._data_type = data_type
-        self._swap = swap
-        self._device_class = device_class
-        self._state_class = state_class
-        self._modbus_client = modbus_client
-        self._state = None
-        self._unique_id = unique_id
-        self._device_info = device_info
+    if coordinator.derived is not None:
+        # Inputs of the derived metrics are read even if their own sensors are disabled
+        coordinator.derived.register()
+        sensors.extend(
+            EmonioDerivedSensor(coordinator, description, mac_suffix, device_info)
+            for description in DERIVED_SENSORS
+        )
 
-    @property
-    def name(self):
-        return self._name
+    sensors.extend(
+        EmonioDiagnosticSensor(coordinator, description, mac_suffix, device_info)
+        for description in DIAGNOSTIC_SENSORS
+    )
+    return sensors
 
-    @property
-    def unique_id(self):
-        return self._unique_id
+def _setup_consumers(hass, config_entry, coordinator, mac_suffix):
+    """Start the optional exporter, statistics import, push receiver and sampler of one device.
+
+    They are stopped by the coordinator before it releases its connection.
+    """
+    export_path = config_entry.options.get(CONF_EXPORT_PATH)
+    if export_path:
+        index = coordinator.poller.index
+        exporter = EmonioExporter(
+            hass,
+            coordinator,
+            hass.config.path(export_path),
+            f"emonio_{mac_suffix.lower()}",
+            [REGISTERS_BY_ADDRESS[address].key for address in sorted(index, key=index.get)],
+            config_entry.options.get(CONF_EXPORT_MAX_SIZE, DEFAULT_EXPORT_MAX_SIZE) * 1024 * 1024,
+        )
+        coordinator.async_on_close(exporter.async_close)
+        coordinator.async_on_close(coordinator.async_add_listener(exporter.handle_update))
+
+    if config_entry.options.get(CONF_IMPORT_STATISTICS, DEFAULT_IMPORT_STATISTICS):
+        importer = EmonioStatisticsImporter(
+            hass,
+            coordinator,
+            mac_suffix,
+            [
+                register for register in REGISTERS
+                if register.quantity.key == "energy" and register.address in coordinator.poller.index
+            ],
+        )
+        coordinator.async_on_close(coordinator.async_add_listener(importer.handle_update))
+
+    push_topic = config_entry.options.get(CONF_PUSH_TOPIC)
+    if push_topic:
+        coordinator.stream = EmonioPushReceiver(
+            hass, coordinator, push_topic.replace("{unit}", str(coordinator.unit))
+        )
+        coordinator.async_on_close(coordinator.stream.async_stop)
+        coordinator.async_create_background_task(
+            config_entry, coordinator.stream.async_start(), f"{DOMAIN} push {coordinator.host} unit {coordinator.unit}"
+        )
+
+    if coordinator.sampler is not None:
+        coordinator.async_create_background_task(
+            config_entry, coordinator.sampler.async_run(), f"{DOMAIN} sampler {coordinator.host} unit {coordinator.unit}"
+        )
+
+class EmonioModbusSensor(CoordinatorEntity, RestoreEntity, SensorEntity):
+    """One register of a device.
+
+    Static metadata comes from the shared description and the ``_attr_``
+    fields HA caches between state writes, so an entity only holds its
+    name, unique ID and what it last wrote. The value is served as
+    ``native_value``, so the unit and display precision users pick for a
+    sensor apply. Until the device is first read, the entity shows its
+    state from before the restart.
+    """
+
+    entity_description: EmonioSensorEntityDescription
+
+    def __init__(self, coordinator, description, mac_suffix, device_info):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"Emonio {mac_suffix} {description.name}"
+        self._attr_unique_id = f"{mac_suffix}_emonio_{description.key}"
+        self._attr_device_info = device_info
+        # Slot of the register in the poller's values, known once all
+        # registers of the device are in its read plan
+        self._slot = None
+        # What the entity last wrote to the state machine
+        self._published_value = None
+        self._published_at = None
+        self._published_available = None
 
     @property
-    def unit_of_measurement(self):
-        return self._unit_of_measurement
+    def native_value(self):
+        return self._published_value
+
+    async def async_added_to_hass(self):
+        """Publish the current value, or the restored one before the first read."""
+        await super().async_added_to_hass()
+        self._slot = self.coordinator.poller.index.get(self.entity_description.address)
+        value = self._current_value()
+        if value is None:
+            value = await self._async_restored_value()
+        self._published_value = value
+        self._attr_extra_state_attributes = self._sample_attributes()
+        self._published_at = time.monotonic()
+        self._published_available = self.available
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the new state only if it left the deadband or got too old."""
+        value = self._current_value()
+        now = time.monotonic()
+        available = self.available
+        summary = None
+        state = self._published_value
+        if available == self._published_available:
+            if value is None or state is None:
+                publish = value != state
+            elif now - self._published_at >= MAX_STATE_AGE:
+                publish = True
+            else:
+                description = self.entity_description
+                threshold = max(description.deadband, description.deadband_relative * abs(state))
+                publish = abs(value - state) > threshold
+                if not publish and description.sampled:
+                    # Publish spikes seen by the sampler even when the polled value did not move
+                    summary = self._sample_summary()
+                    if summary is not None:
+                        _, minimum, maximum, _ = summary
+                        publish = maximum - state > threshold or state - minimum > threshold
+            if not publish:
+                self.coordinator.suppressed_writes += 1
+                return
+        self._published_value = value
+        self._attr_extra_state_attributes = self._sample_attributes(summary)
+        self._published_at = now
+        self._published_available = available
+        self.coordinator.published_writes += 1
+        self.async_write_ha_state()
+
+    def _sample_attributes(self, summary=None):
+        """Return the sample window of the register as state attributes."""
+        if summary is None:
+            summary = self._sample_summary()
+            if summary is None:
+                return None
+        mean, minimum, maximum, last = summary
+        return {
+            "mean": round(mean, 2),
+            "min": round(minimum, 2),
+            "max": round(maximum, 2),
+            "last": round(last, 2),
+            "samples": self.coordinator.sampler.window,
+        }
+
+    def _sample_summary(self):
+        if self.coordinator.sampler is None or not self.entity_description.sampled:
+            return None
+        return self.coordinator.sampler.summary(self.entity_description.address)
+
+    async def _async_restored_value(self):
+        last_state = await self.async_get_last_state()
+        if last_state is None or last_state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return None
+        try:
+            return float(last_state.state)
+        except ValueError:
+            return None
+
+    def _current_value(self):
+        data = self.coordinator.data
+        if not data or self._slot is None:
+            return None
+        raw_value = data[self._slot]
+        if raw_value is None:
+            return None
+        return round(raw_value, 2)  # Format to two decimal places
+
+
+class EmonioDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Expose one poll metric of the device."""
+
+    entity_description: EmonioDiagnosticSensorEntityDescription
+
+    def __init__(self, coordinator, description, mac_suffix, device_info):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"Emonio {mac_suffix} {description.name}"
+        self._attr_unique_id = f"{mac_suffix}_emonio_{description.key}"
+        self._attr_device_info = device_info
 
     @property
-    def device_class(self):
-        return self._device_class
+    def available(self):
+        # Metrics matter most while the device is failing
+        return True
 
     @property
-    def state_class(self):
-        return self._state_class
+    def native_value(self):
+        return self.entity_description.value_fn(self.coordinator.metrics)
+
+
+class EmonioDerivedSensor(CoordinatorEntity, SensorEntity):
+    """Expose one metric derived from the device's snapshot."""
+
+    def __init__(self, coordinator, description, mac_suffix, device_info):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"Emonio {mac_suffix} {description.name}"
+        self._attr_unique_id = f"{mac_suffix}_emonio_{description.key}"
+        self._attr_device_info = device_info
 
     @property
-    def state(self):
-        return self._state
+    def native_value(self):
+        return self.coordinator.derived.values[self.entity_description.key]
+
+
+class EmonioSiteSensor(CoordinatorEntity, SensorEntity):
+    """A total over all meters, from the site's synchronized snapshot."""
+
+    def __init__(self, coordinator, description):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"Emonio Site {description.name}"
+        self._attr_unique_id = f"{DOMAIN}_site_{description.key}"
 
     @property
-    def device_info(self):
-        return self._device_info
+    def native_value(self):
+        if self.coordinator.data is None:
+            return None
+        return self.coordinator.data[self.entity_description.key]
 
-    async def async_update(self):
-        """Fetch new state data for the sensor."""
-        try:
-            if not self._modbus_client.is_socket_open():
-                self._modbus_client.connect()
 
-            result = self._modbus_client.read_holding_registers(self._address, 2, unit=1)
-            if result.isError():
-                _LOGGER.error(f"Error reading {self._name} at address {self._address}")
-                return
+class EmonioSiteEnergySensor(EmonioSiteSensor, RestoreSensor):
+    """The energy of all meters, continued from its state before the restart."""
 
-            registers = result.registers
-            if self._swap == 'word':
-                registers.reverse()
-
-            decoder = BinaryPayloadDecoder.fromRegisters(
-                registers,
-                byteorder=Endian.Big
-            )
-            raw_value = decoder.decode_32bit_float()
-            self._state = round(raw_value, 2)  # Format to two decimal places
-        except Exception as e:
-            _LOGGER.error(f"Error updating {self._name}: {e}")
-            self._state = self._state  # Retain the last known value
-        finally:
-            # Do not close the client to keep the connection persistent
-            pass
-
-    def close_connection(self):
-        """Close the Modbus client connection."""
-        if self._modbus_client:
-            self._modbus_client.close()
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            self.coordinator.restore_energy(float(last.native_value))
@@ -0,0 +1,187 @@
+"""Emonio P3 Modbus/TCP simulator for offline testing and benchmarks.
+
+Serves the register layout of the register map: four phase blocks at
+0/100/200/300 with word-swapped float32 values. Latency, jitter, dropped
+connections and exception responses can be injected. Like any module of
+the integration it needs Home Assistant installed. Run a few meters with:
+
+    python -m custom_components.emonio.simulator --port 5020 --meters 4
+"""
+import argparse
+import asyncio
+import logging
+import math
+import random
+import struct
+import time
+
+from .modbus import READ_HOLDING_REGISTERS
+from .registers import REGISTERS
+
+_LOGGER = logging.getLogger(__name__)
+
+_MBAP = struct.Struct(">HHHB")
+_READ_REQUEST = struct.Struct(">BHH")
+_FLOAT32 = struct.Struct(">f")
+_WORDS = struct.Struct(">HH")
+
+REGISTER_COUNT = 400
+MAX_READ_REGISTERS = 125
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+SERVER_DEVICE_FAILURE = 0x04
+
+# Typical values per quantity; measurements wander around these
+NOMINAL_VALUES = {
+    "voltage": 230.0,
+    "current": 5.0,
+    "power": 1100.0,
+    "apparent_power_reactive": 150.0,
+    "apparent_power": 1150.0,
+    "frequency": 50.0,
+    "power_factor": 95.0,
+}
+
+
+class EmonioSimulator:
+    """A simulated Emonio P3 answering Modbus/TCP read requests."""
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        drop_rate=0.0,
+        exception_rate=0.0,
+        unit_ids=None,
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.exception_rate = exception_rate
+        self.unit_ids = set(unit_ids) if unit_ids else None
+        self.requests = 0
+        self.dropped = 0
+        self.exceptions = 0
+        self._random = random.Random(seed)
+        self._registers = bytearray(REGISTER_COUNT * 2)
+        self._energy = {register.address: 1000.0 * (i + 1) for i, register in enumerate(REGISTERS)}
+        self._started = time.monotonic()
+        self._server = None
+
+    def set_value(self, address, value):
+        """Store a word-swapped float32 at ``address``."""
+        high, low = _WORDS.unpack(_FLOAT32.pack(value))
+        _WORDS.pack_into(self._registers, address * 2, low, high)
+
+    def update_values(self):
+        """Move every register to a new plausible value."""
+        elapsed = time.monotonic() - self._started
+        for register in REGISTERS:
+            key = register.quantity.key
+            if key == "energy":
+                # Counters only ever increase
+                self._energy[register.address] += self._random.uniform(0, 0.01)
+                value = self._energy[register.address]
+            else:
+                nominal = NOMINAL_VALUES[key]
+                wave = 1 + 0.05 * math.sin(elapsed / 10 + register.address)
+                value = nominal * wave * self._random.uniform(0.99, 1.01)
+            self.set_value(register.address, value)
+
+    async def start(self, host="127.0.0.1", port=5020):
+        """Start serving on ``host:port``; returns the bound port."""
+        self.update_values()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(_MBAP.size)
+                transaction_id, protocol_id, length, unit = _MBAP.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+
+                delay = self.latency + self._random.uniform(0, self.jitter)
+                if delay:
+                    await asyncio.sleep(delay)
+                if self._random.random() < self.drop_rate:
+                    self.dropped += 1
+                    break
+                if self.unit_ids is not None and unit not in self.unit_ids:
+                    # A gateway without a device behind this unit id does not answer
+                    continue
+
+                response = self._respond(pdu)
+                writer.write(_MBAP.pack(transaction_id, protocol_id, len(response) + 1, unit) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, pdu):
+        function = pdu[0]
+        if function != READ_HOLDING_REGISTERS or len(pdu) != _READ_REQUEST.size:
+            return self._exception(function, ILLEGAL_FUNCTION)
+        _, address, count = _READ_REQUEST.unpack(pdu)
+        if not 1 <= count <= MAX_READ_REGISTERS or address + count > REGISTER_COUNT:
+            return self._exception(function, ILLEGAL_DATA_ADDRESS)
+        if self._random.random() < self.exception_rate:
+            return self._exception(function, SERVER_DEVICE_FAILURE)
+        self.update_values()
+        data = self._registers[address * 2:(address + count) * 2]
+        return bytes((function, len(data))) + data
+
+    def _exception(self, function, code):
+        self.exceptions += 1
+        return bytes((function | 0x80, code))
+
+
+async def _run(args):
+    simulators = []
+    for index in range(args.meters):
+        simulator = EmonioSimulator(
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            drop_rate=args.drop_rate,
+            exception_rate=args.exception_rate,
+        )
+        port = await simulator.start(args.host, args.port + index)
+        _LOGGER.info(f"Simulated Emonio P3 listening on {args.host}:{port}")
+        simulators.append(simulator)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for simulator in simulators:
+            await simulator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate Emonio P3 meters over Modbus/TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020, help="port of the first meter")
+    parser.add_argument("--meters", type=int, default=1, help="meters on consecutive ports")
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in ms")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of requests that drop the connection")
+    parser.add_argument("--exception-rate", type=float, default=0.0, help="share of requests answered with an exception")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+
+from homeassistant.components.sensor import SensorEntityDescription
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_SITE, DOMAIN
+from .registers import REGISTERS, REGISTERS_BY_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+# Registers summed over all meters into the site totals
+SITE_SENSORS = tuple(
+    SensorEntityDescription(
+        key=register.key,
+        name=register.name,
+        native_unit_of_measurement=register.quantity.unit,
+        device_class=register.quantity.device_class,
+        state_class=register.quantity.state_class,
+    )
+    for register in (
+        REGISTERS_BY_KEY[key]
+        for key in (
+            "phase_a_power",
+            "phase_b_power",
+            "phase_c_power",
+            "total_power",
+            "total_apparent_power_reactive",
+            "total_apparent_power",
+            "total_energy",
+        )
+    )
+)
+
+# Site sensor counting the energy of all meters; it adds up the changes
+# of their counters instead of summing the counters themselves
+SITE_ENERGY = "total_energy"
+
+# Columns of the snapshot matrix
+QUANTITIES = tuple(register.key for register in REGISTERS)
+_COLUMNS = {key: column for column, key in enumerate(QUANTITIES)}
+
+
+def meters(hass: HomeAssistant):
+    """Return the coordinators of every configured meter by device name."""
+    return {
+        entry_data["suffixes"][unit]: coordinator
+        for entry_data in hass.data.get(DOMAIN, {}).values()
+        for unit, coordinator in entry_data["coordinators"].items()
+    }
+
+
+def _row(coordinator, data):
+    """Pick the values of ``data`` in the order of the snapshot columns."""
+    index = coordinator.poller.index
+    return [
+        None if register.address not in index else data[index[register.address]]
+        for register in REGISTERS
+    ]
+
+
+async def async_read_all(hass: HomeAssistant, due_only=False):
+    """Read every meter at once and return one aligned snapshot.
+
+    All meters are read concurrently, bounded only by the connection pool,
+    and each publishes its readings to its own entities. The snapshot is a
+    matrix with one row per meter and one column per quantity; a meter that
+    could not be read is not ``available`` and has a row of ``None``.
+    ``skew`` is the time in seconds between the first and the last meter
+    answering.
+    """
+    coordinators = meters(hass)
+    timestamp = dt_util.utcnow()
+
+    async def read(coordinator):
+        data = await coordinator.async_read_now(due_only)
+        # Copy now, the poller reuses its value list
+        if data is None:
+            return None, [None] * len(QUANTITIES)
+        return time.monotonic(), _row(coordinator, data)
+
+    results = await asyncio.gather(*(read(coordinator) for coordinator in coordinators.values()))
+    answered = [read_at for read_at, row in results if read_at is not None]
+    return {
+        "timestamp": timestamp.isoformat(),
+        "skew": round(max(answered) - min(answered), 3) if answered else None,
+        "meters": list(coordinators),
+        "available": [read_at is not None for read_at, row in results],
+        "quantities": list(QUANTITIES),
+        "values": [row for read_at, row in results],
+    }
+
+
+def aggregate(snapshot):
+    """Sum the site sensors' registers over the meters of a snapshot.
+
+    A total is ``None`` unless every meter has a value, so a meter that
+    could not be read never shows up as a drop of the site total.
+    """
+    rows = snapshot["values"]
+    totals = {}
+    for description in SITE_SENSORS:
+        column = _COLUMNS[description.key]
+        values = [row[column] for row in rows]
+        totals[description.key] = (
+            round(sum(values), 3) if values and None not in values else None
+        )
+    return totals
+
+
+class EmonioSiteCoordinator(DataUpdateCoordinator):
+    """Read all meters in one synchronized cycle and compute the site totals.
+
+    Each cycle reads the due poll groups of every meter together, so the
+    totals are computed once from readings taken at the same time instead
+    of from meters polled on their own timers. Reading a meter restarts its
+    own timer, so while the site is read at least as often as the meters,
+    the site cycle drives them all.
+
+    The site energy only ever grows by what the meters' counters added
+    since the last cycle. A meter joining or leaving the site, or one
+    counter being reset, therefore never shows up as a drop that long-term
+    statistics would book as a reset of the whole site.
+    """
+
+    def __init__(self, hass: HomeAssistant, update_interval):
+        super().__init__(hass, _LOGGER, name=DATA_SITE, update_interval=update_interval)
+        self.snapshot = None
+        self.energy = None
+        # device name -> last energy counter reading added to the site energy
+        self._counters = {}
+
+    def restore_energy(self, energy):
+        """Continue the site energy from its state before the restart."""
+        if self.energy is None:
+            self.energy = energy
+
+    def _count_energy(self, snapshot, totals):
+        column = _COLUMNS[SITE_ENERGY]
+        first = self.energy is None
+        if first and totals[SITE_ENERGY] is None:
+            # Start from the counters once every meter could be read
+            return
+        for meter, row in zip(snapshot["meters"], snapshot["values"]):
+            value = row[column]
+            if value is None:
+                continue
+            last = self._counters.get(meter)
+            self._counters[meter] = value
+            if first or last is None:
+                continue  # Only the first reading of a meter, nothing was added yet
+            # A lower reading is a counter reset, which counts up from zero
+            self.energy += value - last if value >= last else value
+        if first:
+            self.energy = totals[SITE_ENERGY]
+
+    async def _async_update_data(self):
+        snapshot = await async_read_all(self.hass, due_only=True)
+        if snapshot["meters"] and not any(snapshot["available"]):
+            raise UpdateFailed("None of the Emonio meters could be read")
+        self.snapshot = snapshot
+        totals = aggregate(snapshot)
+        self._count_energy(snapshot, totals)
+        totals[SITE_ENERGY] = None if self.energy is None else round(self.energy, 3)
+        return totals
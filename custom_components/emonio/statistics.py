@@ -0,0 +1,147 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+
+
+def _hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def build_hourly_statistics(hours, last):
+    """Turn counter readings into hourly statistic rows.
+
+    ``hours`` maps the start of completed hours to the last counter value
+    read in them, ``last`` is the ``(start, state, sum)`` of the last row
+    already imported or ``None``. Hours without readings, e.g. during a
+    network outage, get rows with the consumed energy spread evenly over
+    them, so the sum has no gap. A counter that went backwards is taken as
+    reset to zero. Returns the rows and the new ``last``.
+    """
+    rows = []
+    for start in sorted(hours):
+        state = hours[start]
+        if last is None:
+            last = (start, state, 0.0)
+            rows.append({"start": start, "state": state, "sum": 0.0})
+            continue
+        last_start, last_state, last_sum = last
+        if start <= last_start:
+            continue  # Already imported
+        delta = state - last_state
+        reset = delta < 0
+        if reset:
+            delta = state
+        elapsed = round((start - last_start) / HOUR)
+        for step in range(1, elapsed):
+            rows.append({
+                "start": last_start + step * HOUR,
+                "state": last_state if reset else last_state + delta * step / elapsed,
+                "sum": last_sum + delta * step / elapsed,
+            })
+        last = (start, state, last_sum + delta)
+        rows.append({"start": start, "state": state, "sum": last_sum + delta})
+    return rows, last
+
+
+class EmonioStatisticsImporter:
+    """Import hourly long-term statistics of the energy counters in bulk.
+
+    The last counter reading of every hour is buffered in memory, also
+    while the recorder is busy or unavailable. Once an hour is complete, its
+    statistics are written with a single import call per counter instead
+    of being compiled from individual state writes. The statistics are
+    external ones (``emonio:<device>_<register>``) so they can be picked in
+    the energy dashboard next to the sensors.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator, mac_suffix, registers):
+        self.hass = hass
+        self.coordinator = coordinator
+        self.registers = registers
+        self.statistic_ids = {
+            register.address: f"{DOMAIN}:{mac_suffix.lower()}_{register.key}"
+            for register in registers
+        }
+        self._names = {
+            register.address: f"Emonio {mac_suffix} {register.name}" for register in registers
+        }
+        self._hours = {register.address: {} for register in registers}
+        self._last = {}
+        self._importing = False
+        self.rows_imported = 0
+
+    @callback
+    def handle_update(self):
+        """Buffer the counters of the current snapshot."""
+        if not self.coordinator.last_update_success or not self.coordinator.data:
+            return
+        current_hour = _hour_start(dt_util.utcnow())
+        index = self.coordinator.poller.index
+        for register in self.registers:
+            slot = index.get(register.address)
+            value = None if slot is None else self.coordinator.data[slot]
+            if value is not None:
+                self._hours[register.address][current_hour] = value
+
+        if not self._importing and any(
+            min(hours, default=current_hour) < current_hour for hours in self._hours.values()
+        ):
+            self.hass.async_create_task(self.async_import(current_hour))
+
+    async def _async_load_last(self, address):
+        statistic_id = self.statistic_ids[address]
+        last = await get_instance(self.hass).async_add_executor_job(
+            get_last_statistics, self.hass, 1, statistic_id, True, {"state", "sum"}
+        )
+        if not last.get(statistic_id):
+            return None
+        row = last[statistic_id][0]
+        start = row["start"]
+        if not isinstance(start, datetime):
+            start = datetime.fromtimestamp(start, tz=timezone.utc)
+        return start, row["state"], row["sum"]
+
+    async def async_import(self, current_hour):
+        """Import every completed hour buffered so far."""
+        self._importing = True
+        try:
+            for register in self.registers:
+                address = register.address
+                hours = self._hours[address]
+                completed = {start: value for start, value in hours.items() if start < current_hour}
+                if not completed:
+                    continue
+                if address not in self._last:
+                    self._last[address] = await self._async_load_last(address)
+                rows, self._last[address] = build_hourly_statistics(completed, self._last[address])
+                for start in completed:
+                    del hours[start]
+                if not rows:
+                    continue
+                metadata = {
+                    "has_mean": False,
+                    "has_sum": True,
+                    "name": self._names[address],
+                    "source": DOMAIN,
+                    "statistic_id": self.statistic_ids[address],
+                    "unit_of_measurement": register.quantity.unit,
+                }
+                async_add_external_statistics(self.hass, metadata, rows)
+                self.rows_imported += len(rows)
+        except Exception as e:
+            _LOGGER.error(f"Error importing energy statistics: {e}")
+        finally:
+            self._importing = False
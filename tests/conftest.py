@@ -0,0 +1,20 @@
+"""Fixtures for the Emonio tests."""
+import pytest
+
+from custom_components.emonio.simulator import EmonioSimulator
+
+
+@pytest.fixture
+async def start_simulator(socket_enabled):
+    """Start simulated meters on free local ports; returns (simulator, port)."""
+    simulators = []
+
+    async def start(**kwargs):
+        simulator = EmonioSimulator(seed=0, **kwargs)
+        port = await simulator.start(port=0)
+        simulators.append(simulator)
+        return simulator, port
+
+    yield start
+    for simulator in simulators:
+        await simulator.stop()
@@ -0,0 +1,105 @@
+"""Tests of the energy counter validation."""
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.emonio.const import COUNTER_CONFIRMATIONS, POLL_GROUP_POWER
+from custom_components.emonio.counters import EmonioCounterFilter
+from custom_components.emonio.registers import REGISTERS_BY_KEY
+
+ENERGY = REGISTERS_BY_KEY["phase_a_energy"].address
+POWER = REGISTERS_BY_KEY["phase_a_power"].address
+
+
+@pytest.fixture
+async def counters(hass):
+    poller = SimpleNamespace(index={ENERGY: 0, POWER: 1})
+    counter_filter = EmonioCounterFilter(hass, poller, "emonio.counters.test")
+    yield counter_filter
+    # Write the delayed save now instead of leaving its timer behind
+    await counter_filter.async_save()
+
+
+def _process(counters, energy, power=1000.0, groups=None):
+    values = [energy, power]
+    counters.process(values, groups)
+    return values[0]
+
+
+async def test_plausible_increase_is_accepted(counters, freezer):
+    assert _process(counters, 100.0) == 100.0
+    freezer.tick(3600)
+
+    # 1 kW for an hour
+    assert _process(counters, 101.0) == 101.0
+    assert counters.rejected == 0
+
+
+async def test_invalid_reading_keeps_last_value(counters, freezer):
+    _process(counters, 100.0)
+    freezer.tick(10)
+
+    assert _process(counters, float("nan")) == 100.0
+    assert _process(counters, -5.0) == 100.0
+    assert counters.rejected == 2
+
+
+async def test_float32_rounding_is_held_at_last_value(counters, freezer):
+    _process(counters, 100000.0)
+    freezer.tick(10)
+
+    # Less than one float32 step at this magnitude
+    assert _process(counters, 99999.995) == 100000.0
+    assert counters.rejected == 0
+
+
+async def test_jump_is_published_once_confirmed(counters, freezer):
+    _process(counters, 100.0)
+    for _ in range(COUNTER_CONFIRMATIONS - 1):
+        freezer.tick(10)
+        assert _process(counters, 5000.0) == 100.0
+
+    freezer.tick(10)
+    assert _process(counters, 5000.0) == 5000.0
+    assert counters.rejected == COUNTER_CONFIRMATIONS - 1
+    assert counters.resets == 0
+
+
+async def test_single_glitch_is_dropped(counters, freezer):
+    _process(counters, 100.0)
+    freezer.tick(10)
+    assert _process(counters, 5000.0) == 100.0
+
+    freezer.tick(10)
+    assert _process(counters, 100.001) == 100.001
+
+
+async def test_confirmed_lower_reading_is_a_reset(counters, freezer):
+    _process(counters, 100.0)
+    for _ in range(COUNTER_CONFIRMATIONS - 1):
+        freezer.tick(10)
+        assert _process(counters, 0.5) == 100.0
+
+    freezer.tick(10)
+    assert _process(counters, 0.5) == 0.5
+    assert counters.resets == 1
+
+
+async def test_counters_not_read_are_left_alone(counters):
+    _process(counters, 100.0)
+
+    # The energy group was not polled, so its slot holds an old value
+    assert _process(counters, 50.0, groups={POLL_GROUP_POWER}) == 50.0
+    assert counters.rejected == 0
+
+
+async def test_last_readings_are_restored(hass, counters, freezer):
+    _process(counters, 100.0)
+    await counters.async_save()
+
+    restored = EmonioCounterFilter(hass, counters.poller, "emonio.counters.test")
+    await restored.async_load()
+    freezer.tick(10)
+
+    assert _process(restored, 0.5) == 100.0
+    assert restored.rejected == 1
@@ -0,0 +1,164 @@
+"""Tests of the asyncio Modbus/TCP client against the simulator."""
+import asyncio
+import struct
+import time
+
+import pytest
+
+from custom_components.emonio.const import CIRCUIT_TIMEOUT_THRESHOLD
+from custom_components.emonio.modbus import CircuitOpenError, EmonioModbusClient, ModbusError
+
+TIMEOUT = 0.1
+# Registers not in the register map keep the values a test stores in them
+FREE_ADDRESS = 40
+
+_MBAP = struct.Struct(">HHHB")
+_READ_REQUEST_SIZE = 12
+
+
+def _decode(data):
+    """Decode a word-swapped float32 as stored by the simulator."""
+    low, high = struct.unpack(">HH", data)
+    return struct.unpack(">f", struct.pack(">HH", high, low))[0]
+
+
+@pytest.fixture
+async def client():
+    clients = []
+
+    def create(port, **kwargs):
+        modbus_client = EmonioModbusClient("127.0.0.1", port, timeout=TIMEOUT, **kwargs)
+        clients.append(modbus_client)
+        return modbus_client
+
+    yield create
+    for modbus_client in clients:
+        await modbus_client.close()
+
+
+@pytest.fixture
+async def serve(socket_enabled):
+    """Start a server answering every read request with ``respond(transaction_id)``."""
+    servers = []
+
+    async def start(respond):
+        async def handle(reader, writer):
+            try:
+                while True:
+                    request = await reader.readexactly(_READ_REQUEST_SIZE)
+                    writer.write(respond(_MBAP.unpack_from(request)[0]))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    yield start
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+
+async def _read_blocks(modbus_client, unit, blocks=4):
+    """Read ``blocks`` register blocks at once like a poll; return what each one did."""
+    results = await asyncio.gather(
+        *(modbus_client.read_holding_registers(block * 100, 2, unit=unit) for block in range(blocks)),
+        return_exceptions=True,
+    )
+    outcomes = {asyncio.TimeoutError: "timeout", CircuitOpenError: "backed off"}
+    return [outcomes.get(type(result), "ok") for result in results]
+
+
+async def test_read_holding_registers(start_simulator, client):
+    simulator, port = await start_simulator()
+    simulator.set_value(FREE_ADDRESS, 230.5)
+    modbus_client = client(port)
+
+    data = await modbus_client.read_holding_registers(FREE_ADDRESS, 2)
+
+    assert _decode(data) == 230.5
+    assert modbus_client.connects == 1
+
+
+async def test_pipelined_requests_get_their_own_response(start_simulator, client):
+    simulator, port = await start_simulator(jitter=0.01)
+    addresses = range(FREE_ADDRESS, FREE_ADDRESS + 20, 2)
+    for address in addresses:
+        simulator.set_value(address, float(address))
+    modbus_client = client(port)
+
+    results = await asyncio.gather(
+        *(modbus_client.read_holding_registers(address, 2) for address in addresses)
+    )
+
+    assert [_decode(data) for data in results] == [float(address) for address in addresses]
+    assert modbus_client.connects == 1
+
+
+@pytest.mark.parametrize("length", [0, 1])
+async def test_response_without_function_code_drops_connection(serve, client, length):
+    port = await serve(lambda transaction_id: _MBAP.pack(transaction_id, 0, length, 1))
+    modbus_client = client(port)
+
+    with pytest.raises(ModbusError):
+        await modbus_client.read_holding_registers(0, 2)
+    assert not modbus_client.connected
+
+
+async def test_response_shorter_than_its_byte_count_is_rejected(serve, client):
+    # Claims 4 bytes of registers but carries 2
+    pdu = bytes((0x03, 4, 0x12, 0x34))
+    port = await serve(lambda transaction_id: _MBAP.pack(transaction_id, 0, len(pdu) + 1, 1) + pdu)
+    modbus_client = client(port)
+
+    with pytest.raises(ModbusError, match="Expected 4 bytes"):
+        await modbus_client.read_holding_registers(0, 2)
+
+
+async def test_silent_device_opens_circuit(start_simulator, client):
+    _, port = await start_simulator(unit_ids=[2])
+    modbus_client = client(port)
+
+    for _ in range(CIRCUIT_TIMEOUT_THRESHOLD):
+        with pytest.raises(asyncio.TimeoutError):
+            await modbus_client.read_holding_registers(0, 2, unit=1)
+
+    assert not modbus_client.connected
+    assert modbus_client.circuit_open
+    with pytest.raises(CircuitOpenError):
+        await modbus_client.read_holding_registers(0, 2, unit=1)
+
+
+async def test_silent_unit_is_backed_off_while_others_answer(start_simulator, client):
+    _, port = await start_simulator(unit_ids=[2])
+    modbus_client = client(port, max_in_flight=1)
+    await modbus_client.read_holding_registers(0, 2, unit=2)
+    # As after a lost connection: unit 2 is not asked on the new one yet
+    await modbus_client._disconnect()
+
+    started = time.monotonic()
+    silent, answering = await asyncio.gather(_read_blocks(modbus_client, 1), _read_blocks(modbus_client, 2))
+
+    assert silent == ["timeout"] * CIRCUIT_TIMEOUT_THRESHOLD + ["backed off"]
+    assert answering == ["ok"] * 4
+    assert modbus_client.connected
+    assert modbus_client.connects == 2
+    assert modbus_client.unit_retry_in(1) > 0
+    assert modbus_client.unit_retry_in(2) == 0
+    # Blocks queued behind the timeouts fail fast instead of timing out too
+    assert time.monotonic() - started < (CIRCUIT_TIMEOUT_THRESHOLD + 1) * TIMEOUT
+
+
+async def test_closed_client_does_not_reconnect(start_simulator, client):
+    _, port = await start_simulator()
+    modbus_client = client(port)
+    await modbus_client.read_holding_registers(0, 2)
+
+    await modbus_client.close()
+
+    with pytest.raises(CircuitOpenError):
+        await modbus_client.read_holding_registers(0, 2)
+    assert modbus_client.connects == 1
@@ -0,0 +1,57 @@
+"""Tests of the hourly statistics built from counter readings."""
+from datetime import datetime, timezone
+
+from custom_components.emonio.statistics import HOUR, build_hourly_statistics
+
+START = datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+
+
+def _hours(*states):
+    """Map consecutive hours from ``START`` to ``states``, skipping ``None``."""
+    return {START + hour * HOUR: state for hour, state in enumerate(states) if state is not None}
+
+
+def test_first_hour_starts_the_sum():
+    rows, last = build_hourly_statistics(_hours(100.0), None)
+
+    assert rows == [{"start": START, "state": 100.0, "sum": 0.0}]
+    assert last == (START, 100.0, 0.0)
+
+
+def test_sum_grows_by_the_consumption_of_each_hour():
+    rows, last = build_hourly_statistics(_hours(100.0, 101.5, 104.0), None)
+
+    assert [row["sum"] for row in rows] == [0.0, 1.5, 4.0]
+    assert last == (START + 2 * HOUR, 104.0, 4.0)
+
+
+def test_hours_without_readings_are_filled_evenly():
+    rows, _ = build_hourly_statistics(_hours(100.0, None, None, 106.0), None)
+
+    assert [row["start"] for row in rows] == [START + hour * HOUR for hour in range(4)]
+    assert [row["state"] for row in rows] == [100.0, 102.0, 104.0, 106.0]
+    assert [row["sum"] for row in rows] == [0.0, 2.0, 4.0, 6.0]
+
+
+def test_counter_reset_counts_from_zero():
+    rows, last = build_hourly_statistics(_hours(100.0, 102.0, 1.5), None)
+
+    assert [row["sum"] for row in rows] == [0.0, 2.0, 3.5]
+    assert last == (START + 2 * HOUR, 1.5, 3.5)
+
+
+def test_gap_before_a_reset_keeps_the_last_state():
+    rows, _ = build_hourly_statistics(_hours(100.0, None, 2.0), None)
+
+    assert [row["state"] for row in rows] == [100.0, 100.0, 2.0]
+    assert [row["sum"] for row in rows] == [0.0, 1.0, 2.0]
+
+
+def test_continues_from_the_last_imported_row():
+    last = (START, 100.0, 50.0)
+
+    rows, last = build_hourly_statistics(_hours(100.0, 103.0), last)
+
+    # The first hour was imported already
+    assert rows == [{"start": START + HOUR, "state": 103.0, "sum": 53.0}]
+    assert last == (START + HOUR, 103.0, 53.0)